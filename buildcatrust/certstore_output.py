@@ -8,6 +8,30 @@ from . import der_x509
 from . import enums
 from . import types
 
+# The usage listing and OpenSSL CERT_AUX for each Trust.trust_state; stores
+# only ever have a handful of distinct trust states between them.
+_TRUST_RENDERINGS = {}  # type: dict[int, tuple[str, bytes]]
+
+
+def _trust_rendering(trust: types.Trust) -> tuple[str, bytes]:
+    rendering = _TRUST_RENDERINGS.get(trust.trust_state)
+    if rendering is None:
+        lines = []
+        if trust.trusted_key_usages:
+            lines.append("Trusted for:\n")
+            for usage in trust.trusted_key_usages:
+                lines.append(f"  - {str(usage)} ({usage.name})\n")
+        if trust.untrusted_key_usages:
+            lines.append("Rejected for:\n")
+            for usage in trust.untrusted_key_usages:
+                lines.append(f"  - {str(usage)} ({usage.name})\n")
+        cert_aux = der_x509.OpenSSLCertAux(
+            trust=trust.trusted_key_usages,
+            reject=trust.untrusted_key_usages,
+        ).as_der()
+        rendering = _TRUST_RENDERINGS[trust.trust_state] = ("".join(lines), cert_aux)
+    return rendering
+
 
 class CertStoreOutput:
     def __init__(self, fp: TextIO):
@@ -17,17 +41,17 @@ class CertStoreOutput:
         if not cert:
             return
 
-        print(cert.label, file=self.fp)
+        self.fp.write(self._render(cert, trust))
 
+    def _render(self, cert: types.Certificate, trust: types.Trust) -> str:
         if trust.trust_server_auth == enums.TrustType.TRUSTED_DELEGATOR:
             # Output the "plain" version for applications expecting just plain CERTIFICATE entries.
             # We only do this if the cert is affirmatively trusted for being a CA for server-side auth.
-            print(cert.as_pem().encode(), file=self.fp)
-        else:
-            print(
-                "Traditional PEM block omitted: this certificate is not trusted for authenticating servers.",
-                file=self.fp,
-            )
+            return f"{cert.label}\n{cert.as_pem_text()}\n"
+        return (
+            f"{cert.label}\n"
+            "Traditional PEM block omitted: this certificate is not trusted for authenticating servers.\n"
+        )
 
 
 class StandardCertStoreOutput(CertStoreOutput):
@@ -38,26 +62,10 @@ class StandardCertStoreOutput(CertStoreOutput):
 
 
 class OpenSSLCertStoreOutput(CertStoreOutput):
-    def output(self, cert: types.Certificate | None, trust: types.Trust) -> None:
-        if not cert:
-            return
-
-        super().output(cert, trust)
-
+    def _render(self, cert: types.Certificate, trust: types.Trust) -> str:
         # Output OpenSSL-style TRUSTED CERTIFICATE entries.
-        if trust.trusted_key_usages:
-            print("Trusted for:", file=self.fp)
-            for usage in trust.trusted_key_usages:
-                print(f"  - {str(usage)} ({usage.name})", file=self.fp)
-        if trust.untrusted_key_usages:
-            print("Rejected for:", file=self.fp)
-            for usage in trust.untrusted_key_usages:
-                print(f"  - {str(usage)} ({usage.name})", file=self.fp)
-        cert_aux = der_x509.OpenSSLCertAux(
-            trust=trust.trusted_key_usages,
-            reject=trust.untrusted_key_usages,
-        ).as_der()
+        usages, cert_aux = _trust_rendering(trust)
         pem_block = der_x509.PEMBlock(
             name="TRUSTED CERTIFICATE", content=cert.value + cert_aux
         )
-        print(pem_block.encode(), file=self.fp)
+        return f"{super()._render(cert, trust)}{usages}{pem_block.encode()}\n"
@@ -2,6 +2,10 @@
 #
 # SPDX-License-Identifier: MIT
 
+from collections.abc import Iterator
+import contextlib
+import mmap
+import os
 from typing import TextIO
 
 from . import der_x509
@@ -9,14 +13,24 @@ from . import enums
 from . import types
 from . import x509_consts
 
+# Plain PEM certificates are trusted for the core purposes only.
+_PLAIN_PEM_TRUST = {
+    attr: enums.TrustType.TRUSTED_DELEGATOR
+    if attr in types.Trust.CORE_TRUST_ATTRS
+    else enums.TrustType.UNKNOWN
+    for attr in types.Trust.TRUST_ATTRS
+}
+_UNKNOWN_TRUST = {attr: enums.TrustType.UNKNOWN for attr in types.Trust.TRUST_ATTRS}
+_PURPOSE_TRUST_ATTRS = {
+    purpose.object_id: f"trust_{purpose.trust_name}" for purpose in x509_consts.PURPOSES
+}
+assert set(_PURPOSE_TRUST_ATTRS.values()) <= set(types.Trust.TRUST_ATTRS)
 
-def _cert_bytes_to_cert_and_trust(
-    b: bytes, trust_attrs: dict[str, enums.TrustType]
+
+def _cert_to_cert_and_trust(
+    x509_cert: der_x509.Certificate, trust_attrs: dict[str, enums.TrustType]
 ) -> tuple[types.Certificate, types.Trust]:
-    x509_cert, trailing = der_x509.Certificate.from_der(b)
-    if trailing:
-        raise Exception("got trailing garbage parsing X509 certificate")
-    cert = types.Certificate.from_x509(b, x509_cert)
+    cert = types.Certificate.from_x509(x509_cert.der, x509_cert)
     trust = types.Trust(
         label=cert.label,
         issuer=cert.issuer,
@@ -28,45 +42,57 @@ def _cert_bytes_to_cert_and_trust(
 
 
 def read_certificates(fp: TextIO) -> list[tuple[types.Certificate, types.Trust]]:
+    return read_certificates_from_buffer(fp.read().encode("utf-8"))
+
+
+@contextlib.contextmanager
+def open_buffer(path: str | os.PathLike) -> Iterator[bytes]:
+    """Yields the contents of path, mapped into memory rather than read if possible."""
+    with open(path, "rb") as fp:
+        try:
+            buf = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # Empty files can't be mapped, and neither can pipes and the like.
+            yield fp.read()
+            return
+        with buf:
+            yield buf
+
+
+def read_certificates_from_path(
+    path: str | os.PathLike,
+) -> list[tuple[types.Certificate, types.Trust]]:
+    with open_buffer(path) as buf:
+        return read_certificates_from_buffer(buf)
+
+
+def read_certificates_from_buffer(
+    buf: bytes,
+) -> list[tuple[types.Certificate, types.Trust]]:
     certs = []
-    while True:
-        data = der_x509.PEMBlock.decode_from_file(fp)
-        if not data:
-            if fp.read(1) == "":
-                # EOF
-                break
-            else:
-                raise OSError("something went wrong")
-        _, pem_block = data
+    for pem_block in der_x509.PEMBlock.decode_all(buf):
         if pem_block.name == "CERTIFICATE":
-            certs.append(
-                _cert_bytes_to_cert_and_trust(
-                    pem_block.content,
-                    {
-                        attr: enums.TrustType.TRUSTED_DELEGATOR
-                        if attr in types.Trust.CORE_TRUST_ATTRS
-                        else enums.TrustType.UNKNOWN
-                        for attr in types.Trust.TRUST_ATTRS
-                    },
-                )
-            )
+            x509_cert, trailing = der_x509.Certificate.from_der(pem_block.content)
+            if trailing:
+                raise Exception("got trailing garbage parsing X509 certificate")
+            certs.append(_cert_to_cert_and_trust(x509_cert, dict(_PLAIN_PEM_TRUST)))
         elif pem_block.name == "TRUSTED CERTIFICATE":
-            cert_bytes, cert_aux, trailing = der_x509.parse_trusted_certificate(
+            x509_cert, cert_aux, trailing = der_x509.decode_trusted_certificate(
                 pem_block
             )
             if trailing:
                 raise Exception("got trailing garbage parsing trusted certificate")
 
-            trust_attrs = {
-                attr: enums.TrustType.UNKNOWN for attr in types.Trust.TRUST_ATTRS
-            }
-            for purpose in x509_consts.PURPOSES:
-                trust_name = f"trust_{purpose.trust_name}"
-                assert trust_name in trust_attrs
-                if purpose.object_id in cert_aux.trust:
-                    trust_attrs[trust_name] = enums.TrustType.TRUSTED_DELEGATOR
-                elif purpose.object_id in cert_aux.reject:
+            trust_attrs = dict(_UNKNOWN_TRUST)
+            # Trust wins over reject if a purpose is somehow in both.
+            for oid in cert_aux.reject:
+                trust_name = _PURPOSE_TRUST_ATTRS.get(oid)
+                if trust_name:
                     trust_attrs[trust_name] = enums.TrustType.NOT_TRUSTED
+            for oid in cert_aux.trust:
+                trust_name = _PURPOSE_TRUST_ATTRS.get(oid)
+                if trust_name:
+                    trust_attrs[trust_name] = enums.TrustType.TRUSTED_DELEGATOR
 
-            certs.append(_cert_bytes_to_cert_and_trust(cert_bytes, trust_attrs))
+            certs.append(_cert_to_cert_and_trust(x509_cert, trust_attrs))
     return certs
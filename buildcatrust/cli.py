@@ -6,78 +6,326 @@
 
 import argparse
 import collections
+from collections.abc import Iterable
+from collections.abc import Iterator
+from collections.abc import Sequence
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
+import io
 import os
 import os.path
+import secrets
+import stat
 import sys
 from typing import Callable, TextIO
 
 from . import certstore_output
-from . import certstore_parser
-from . import nss_parser
+from . import ingest
+from . import ingest_cache
 from . import p11kit_output
 from . import types
 
+OutputClass = Callable[[TextIO], types.CertificateOutput]
 
-def output_to_file(
-    db: types.CertDB,
-    args: argparse.Namespace,
-    arg_name: str,
-    output_cls: Callable[[TextIO], types.CertificateOutput],
-) -> bool:
-    file_name = getattr(args, arg_name)
-    if not file_name:
+
+# Below this many keys a render shard isn't worth sending to another process:
+# shipping the records there and the text back costs more than rendering them.
+MIN_KEYS_PER_RENDER_SHARD = 1024
+
+
+def _render_records(
+    records: Sequence[tuple[str, types.Certificate | None, types.Trust]],
+    output_classes: Sequence[OutputClass],
+) -> dict[OutputClass, dict[str, str]]:
+    rendered = {output_cls: {} for output_cls in output_classes}
+    for key, cert, trust in records:
+        for output_cls, by_key in rendered.items():
+            buf = io.StringIO()
+            output_cls(buf).output(cert, trust)
+            by_key[key] = buf.getvalue()
+    return rendered
+
+
+def render(
+    db: types.CertDB, output_classes: Iterable[OutputClass], jobs: int = 1
+) -> dict[OutputClass, dict[str, str]]:
+    """Renders every trustmap key with each output class, in one pass over db.
+
+    The rendered text is keyed by output class and then by trustmap key, in
+    sorted key order, so every output using the same class shares it. With
+    jobs > 1, large DBs are rendered in shards by a pool of worker processes;
+    the result is the same either way.
+    """
+    output_classes = list(output_classes)
+    records = [
+        (key, db.certmap.get(key, None), db.trustmap[key])
+        for key in sorted(db.trustmap.keys())
+    ]
+    shards = min(jobs, len(records) // MIN_KEYS_PER_RENDER_SHARD)
+    if shards <= 1:
+        return _render_records(records, output_classes)
+
+    cuts = [len(records) * n // shards for n in range(shards + 1)]
+    rendered = {output_cls: {} for output_cls in output_classes}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=shards) as executor:
+        futures = [
+            executor.submit(_render_records, records[start:end], output_classes)
+            for start, end in zip(cuts, cuts[1:])
+        ]
+        for future in futures:
+            for output_cls, by_key in future.result().items():
+                rendered[output_cls].update(by_key)
+    return rendered
+
+
+def _unchanged(path: str, data: bytes, dir_fd: int | None = None) -> bool:
+    try:
+        fd = os.open(path, os.O_RDONLY, dir_fd=dir_fd)
+    except OSError:
         return False
-    with open(file_name, "w") as fp:
-        out = output_cls(fp)
-        for key in sorted(db.trustmap.keys()):
-            out.output(db.certmap.get(key, None), db.trustmap[key])
-    return True
+    with os.fdopen(fd, "rb") as fp:
+        try:
+            return os.fstat(fp.fileno()).st_size == len(data) and fp.read() == data
+        except OSError:
+            return False
 
 
-def _output_to_dir(
-    db: types.CertDB,
-    dir_name: str,
-    output_cls: Callable[[TextIO], types.CertificateOutput],
-    extension: str,
+def output_to_file(
+    rendered: dict[str, str], file_name: str, incremental: bool = False
+) -> None:
+    # Replace the file that a symlink points at, rather than the link.
+    file_name = os.path.realpath(file_name)
+    data = "".join(rendered.values()).encode("utf-8")
+    if incremental and _unchanged(file_name, data):
+        return
+    _write_atomically(file_name, data)
+
+
+@contextlib.contextmanager
+def _open_output_dir(dir_name: str) -> Iterator[int]:
+    """Yields a file descriptor for writing dir_name's entries in place.
+
+    The directory is synced once the entries have been written.
+    """
+    dir_fd = os.open(dir_name, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        yield dir_fd
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def _temp_path(path: str) -> str:
+    head, tail = os.path.split(path)
+    return os.path.join(head, f".{tail}.{secrets.token_hex(8)}.tmp")
+
+
+def _write_atomically(path: str, data: bytes, dir_fd: int | None = None) -> None:
+    """Replaces path with data, so readers see either the old or new file.
+
+    The data is written to a temporary file next to path, which is synced and
+    then renamed over path. An existing path keeps its mode.
+    """
+    try:
+        mode = stat.S_IMODE(os.stat(path, dir_fd=dir_fd).st_mode)
+    except FileNotFoundError:
+        mode = None
+    tmp_path = _temp_path(path)
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666, dir_fd=dir_fd)
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(data)
+            fp.flush()
+            if mode is not None:
+                os.fchmod(fp.fileno(), mode)
+            os.fsync(fp.fileno())
+        os.replace(tmp_path, path, src_dir_fd=dir_fd, dst_dir_fd=dir_fd)
+    except BaseException:
+        try:
+            os.unlink(tmp_path, dir_fd=dir_fd)
+        except OSError:
+            pass
+        raise
+
+
+def _write_file(dir_fd: int, filename: str, text: str, incremental: bool) -> None:
+    data = text.encode("utf-8")
+    if incremental and _unchanged(filename, data, dir_fd):
+        return
+    _write_atomically(filename, data, dir_fd)
+
+
+# With --incremental_output, each directory output records the entries it has
+# written in a manifest in the directory, so that it only ever removes entries
+# that it put there.
+UNPACKED_MANIFEST_FILENAME = ".buildcatrust-unpacked"
+HASHED_MANIFEST_FILENAME = ".buildcatrust-hashed"
+
+
+def _read_manifest(dir_fd: int, manifest_name: str) -> set[str]:
+    try:
+        fd = os.open(manifest_name, os.O_RDONLY, dir_fd=dir_fd)
+    except FileNotFoundError:
+        return set()
+    with os.fdopen(fd, encoding="utf-8") as fp:
+        paths = set(fp.read().splitlines())
+    # Whatever the manifest says, never reach outside the directory.
+    return {
+        path
+        for path in paths
+        if path and all(part not in ("", ".", "..") for part in path.split("/"))
+    }
+
+
+def _write_manifest(dir_fd: int, manifest_name: str, paths: set[str]) -> None:
+    data = "".join(f"{path}\n" for path in sorted(paths)).encode("utf-8")
+    _write_atomically(manifest_name, data, dir_fd)
+
+
+@contextlib.contextmanager
+def _owned_entries(
+    dir_fd: int, manifest_name: str, wanted: set[str], incremental: bool
+) -> Iterator[None]:
+    """Records the entries the body is about to write in the manifest.
+
+    Afterwards, entries written on an earlier run that aren't wanted any more
+    are removed, along with any shard directories that leaves empty. Only
+    incremental output keeps a manifest; otherwise, the directory gets the
+    wanted entries and nothing else.
+    """
+    if not incremental:
+        yield
+        return
+    owned = _read_manifest(dir_fd, manifest_name)
+    if not wanted <= owned:
+        # Record new entries before creating them, so that they're still ours
+        # if we're interrupted.
+        _write_manifest(dir_fd, manifest_name, owned | wanted)
+    yield
+    stale = owned - wanted
+    for path in sorted(stale):
+        try:
+            os.unlink(path, dir_fd=dir_fd)
+        except FileNotFoundError:
+            pass
+    parents = {os.path.dirname(path) for path in stale}
+    parents -= {os.path.dirname(path) for path in wanted}
+    for parent in sorted(parents - {""}):
+        try:
+            os.rmdir(parent, dir_fd=dir_fd)
+        except OSError:
+            # Still holds something that isn't ours.
+            pass
+    if owned != wanted:
+        _write_manifest(dir_fd, manifest_name, wanted)
+
+
+# Sharded unpacked output puts each certificate in a subdirectory named after
+# this many leading hex digits of its fingerprint or subject hash.
+SHARD_PREFIX_LEN = 2
+SHARD_INDEX_FILENAME = "index.txt"
+
+
+def _shard_name(db: types.CertDB, key: str, shard_by: str) -> str:
+    cert = db.certmap.get(key, None)
+    if cert is None:
+        # Trust-only records have no certificate to take a fingerprint or
+        # subject from; spread them out by their key instead.
+        value = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    elif shard_by == "sha256":
+        value = cert.sha256_fingerprint
+    else:
+        value = cert.openssl_subject_hash
+    return value[:SHARD_PREFIX_LEN]
+
+
+def _unpacked_filenames(
+    rendered: dict[str, str], extension: str, shards: dict[str, str] | None = None
 ) -> dict[str, str]:
-    mapkey_to_filename = {}
-    for key in sorted(db.trustmap.keys()):
-        filename = f"{key}{extension}"
-        mapkey_to_filename[key] = filename
-        with open(os.path.join(dir_name, filename), "w") as fp:
-            output_cls(fp).output(db.certmap.get(key, None), db.trustmap[key])
-    return mapkey_to_filename
+    if shards is None:
+        return {key: f"{key}{extension}" for key in rendered}
+    return {key: f"{shards[key]}/{key}{extension}" for key in rendered}
+
+
+def _write_files(
+    dir_fd: int, files: dict[str, str], jobs: int = 1, incremental: bool = False
+) -> None:
+    shards = sorted({os.path.dirname(filename) for filename in files} - {""})
+    for shard in shards:
+        try:
+            os.mkdir(shard, dir_fd=dir_fd)
+        except FileExistsError:
+            pass
+    if jobs <= 1:
+        for filename, text in files.items():
+            _write_file(dir_fd, filename, text, incremental)
+    else:
+        dir_fds = [dir_fd] * len(files)
+        incrementals = [incremental] * len(files)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+            # Drain the iterator so that any error is raised here.
+            for _ in executor.map(
+                _write_file, dir_fds, files.keys(), files.values(), incrementals
+            ):
+                pass
+    for shard in shards:
+        shard_fd = os.open(shard, os.O_RDONLY | os.O_DIRECTORY, dir_fd=dir_fd)
+        try:
+            os.fsync(shard_fd)
+        finally:
+            os.close(shard_fd)
 
 
 def output_to_dir(
     db: types.CertDB,
-    args: argparse.Namespace,
-    arg_name: str,
-    output_cls: Callable[[TextIO], types.CertificateOutput],
+    rendered: dict[str, str],
+    dir_name: str,
     extension: str,
-) -> bool:
-    dir_name = getattr(args, arg_name)
-    if not dir_name:
-        return False
-    _output_to_dir(db, dir_name, output_cls, extension)
-    return True
+    shard_by: str | None = None,
+    jobs: int = 1,
+    incremental: bool = False,
+) -> None:
+    shards = None
+    if shard_by:
+        shards = {key: _shard_name(db, key, shard_by) for key in rendered}
+    mapkey_to_filename = _unpacked_filenames(rendered, extension, shards)
+    files = dict(zip(mapkey_to_filename.values(), rendered.values()))
+    if shards is not None:
+        files[SHARD_INDEX_FILENAME] = "".join(
+            f"{key}\t{filename}\n" for key, filename in mapkey_to_filename.items()
+        )
+    with _open_output_dir(dir_name) as dir_fd:
+        with _owned_entries(
+            dir_fd, UNPACKED_MANIFEST_FILENAME, set(files), incremental
+        ):
+            _write_files(dir_fd, files, jobs, incremental)
 
 
 class TooManyCertificatesError(Exception):
     pass
 
 
-def output_to_hashed_dir(
-    db: types.CertDB,
-    args: argparse.Namespace,
-    arg_name: str,
-    output_cls: Callable[[TextIO], types.CertificateOutput],
-    extension: str,
-) -> bool:
-    dir_name = getattr(args, arg_name)
-    if not dir_name:
-        return False
-    mapkey_to_filename = _output_to_dir(db, dir_name, output_cls, extension)
+def _reconcile_symlink(target: str, link_name: str, dir_fd: int) -> None:
+    try:
+        if os.readlink(link_name, dir_fd=dir_fd) == target:
+            return
+    except OSError:
+        pass
+    # Swap the new link in over the old one, so the name never goes missing.
+    tmp_name = _temp_path(link_name)
+    os.symlink(target, tmp_name, dir_fd=dir_fd)
+    try:
+        os.replace(tmp_name, link_name, src_dir_fd=dir_fd, dst_dir_fd=dir_fd)
+    except BaseException:
+        os.unlink(tmp_name, dir_fd=dir_fd)
+        raise
+
+
+def _hashed_symlinks(
+    db: types.CertDB, mapkey_to_filename: dict[str, str]
+) -> dict[str, str]:
     # Generate symlinks in the same form as c_rehash, that is:
     # (from https://www.openssl.org/docs/manmaster/man1/c_rehash.html)
     # > Links are of the form HHHHHHHH.D, where each H is a hexadecimal character
@@ -95,20 +343,40 @@ def output_to_hashed_dir(
     # which uses the canonicalisation function:
     # https://github.com/openssl/openssl/blob/925118e8c3b1041ce7f9840c2d67e7f878123e6b/crypto/x509/x_name.c#L299-L310
     symlinks_by_hash = collections.defaultdict(set)
-    for mapkey, filename in mapkey_to_filename.items():
-        # We need the certificate; the trust only lists (issuer, serial number).
-        if mapkey not in db.certmap:
-            continue
-        cert = db.certmap[mapkey]
-        symlinks_by_hash[cert.openssl_subject_hash[:8]].add(filename)
+    # Only certificates are in the subject hash index: we need the certificate,
+    # since the trust only lists (issuer, serial number).
+    for subject_hash, mapkeys in db.index("subject_hash").items():
+        for mapkey in mapkeys:
+            if mapkey in mapkey_to_filename:
+                symlinks_by_hash[subject_hash[:8]].add(mapkey_to_filename[mapkey])
+    symlinks = {}
     for hashpart, target_filenames in symlinks_by_hash.items():
         if len(target_filenames) > 10:
             raise TooManyCertificatesError(
                 f"Too many certificates have a truncated subject hash of {hashpart}"
             )
         for n, target_filename in enumerate(sorted(target_filenames)):
-            os.symlink(target_filename, os.path.join(dir_name, f"{hashpart}.{n}"))
-    return True
+            symlinks[f"{hashpart}.{n}"] = target_filename
+    return symlinks
+
+
+def output_to_hashed_dir(
+    db: types.CertDB,
+    rendered: dict[str, str],
+    dir_name: str,
+    extension: str,
+    jobs: int = 1,
+    incremental: bool = False,
+) -> None:
+    mapkey_to_filename = _unpacked_filenames(rendered, extension)
+    symlinks = _hashed_symlinks(db, mapkey_to_filename)
+    files = dict(zip(mapkey_to_filename.values(), rendered.values()))
+    entries = set(files) | set(symlinks)
+    with _open_output_dir(dir_name) as dir_fd:
+        with _owned_entries(dir_fd, HASHED_MANIFEST_FILENAME, entries, incremental):
+            _write_files(dir_fd, files, jobs, incremental)
+            for link_name, target_filename in symlinks.items():
+                _reconcile_symlink(target_filename, link_name, dir_fd)
 
 
 def load_blocklist(path: str) -> set[str]:
@@ -122,6 +390,45 @@ def load_blocklist(path: str) -> set[str]:
     return block
 
 
+# Blocklist entries with one of these prefixes are looked up in the matching
+# CertDB index, rather than as a key or label.
+_BLOCKLIST_PREFIXES = {
+    "sha256:": "sha256",
+    "sha1:": "sha1",
+    "spki-sha256:": "spki_sha256",
+    "subject-hash:": "subject_hash",
+}
+
+
+def resolve_blocklist_entry(db: types.CertDB, entry: str) -> set[str]:
+    """Returns the trustmap keys a blocklist entry refers to."""
+    for prefix, index_name in _BLOCKLIST_PREFIXES.items():
+        if entry.startswith(prefix):
+            # Accept fingerprints in upper case and with colons between bytes,
+            # as printed by e.g. openssl x509 -fingerprint.
+            value = entry[len(prefix) :].strip().replace(":", "").lower()
+            keys = db.lookup(index_name, value)
+            break
+    else:
+        keys = db.lookup("label", entry)
+        if entry in db.trustmap:
+            keys.add(entry)
+    return keys & db.trustmap.keys()
+
+
+def _bundle_files(bundle_path: str) -> list[str]:
+    if os.path.isfile(bundle_path):
+        return [bundle_path]
+    elif os.path.isdir(bundle_path):
+        # Sorted, so that which certificate wins on a clash doesn't depend on
+        # directory order.
+        bundle_files = [
+            os.path.join(bundle_path, f) for f in sorted(os.listdir(bundle_path))
+        ]
+        return [f for f in bundle_files if os.path.isfile(f)]
+    raise FileNotFoundError(f"Bundle not found: {bundle_path}")
+
+
 def _parse_args(args: list[str]) -> tuple[argparse.ArgumentParser, argparse.Namespace]:
     argparser = argparse.ArgumentParser()
     argparser.add_argument(
@@ -137,6 +444,11 @@ def _parse_args(args: list[str]) -> tuple[argparse.ArgumentParser, argparse.Name
     argparser.add_argument(
         "--ca_unpacked_output", help="Path to output certificate unbundled output to."
     )
+    argparser.add_argument(
+        "--ca_unpacked_shard_by",
+        choices=["sha256", "subject_hash"],
+        help=f"Split --ca_unpacked_output into subdirectories named after the first {SHARD_PREFIX_LEN} hex digits of each certificate's SHA-256 fingerprint or OpenSSL subject hash, and write an {SHARD_INDEX_FILENAME} mapping each key to its path. Useful for very large stores.",
+    )
     argparser.add_argument(
         "--ca_hashed_unpacked_output",
         help="Path to output certificate hashed, unbundled output to.",
@@ -154,7 +466,42 @@ def _parse_args(args: list[str]) -> tuple[argparse.ArgumentParser, argparse.Name
     )
     argparser.add_argument(
         "--blocklist_input",
-        help="Path to a new-line separated blocklist of certificates from the provided certstore to distrust. Can be either the label in the NSS store, or the internal key (which is output alongside the certificate in the available output formats).",
+        help="Path to a new-line separated blocklist of certificates from the provided certstore to distrust. Can be either the label in the NSS store, the internal key (which is output alongside the certificate in the available output formats), or one of sha256:, sha1:, spki-sha256: or subject-hash: followed by the hex value to match.",
+    )
+
+    argparser.add_argument(
+        "--incremental_output",
+        action="store_true",
+        help="Only rewrite output files whose contents have changed. The unpacked directories also get a dotfile listing what was written to them, so that later incremental runs can remove entries that are no longer wanted.",
+    )
+
+    argparser.add_argument(
+        "--dedupe_policy",
+        choices=["off", *types.DEDUPE_POLICIES],
+        default="off",
+        help="How to merge certificates that appear more than once with the same SHA-256 fingerprint, e.g. under different labels in different inputs. first_wins keeps the first one seen and its trust; most_restrictive keeps the first one seen, with the most restrictive trust of them all. Applied before the blocklist, so blocklist entries must name the copy that is kept, or match it by fingerprint.",
+    )
+
+    argparser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Cache parsed inputs in $XDG_CACHE_HOME/buildcatrust, keyed by their contents, so that unchanged inputs aren't parsed again. Anyone who can write to the cache can change what the outputs trust.",
+    )
+    argparser.add_argument(
+        "--cache_dir",
+        help="Cache parsed inputs in this directory instead; implies --cache. It must only be writable by users trusted as much as the inputs themselves.",
+    )
+    argparser.add_argument(
+        "--cache_max_bytes",
+        type=int,
+        default=ingest_cache.DEFAULT_MAX_BYTES,
+        help="Size the cache is trimmed to, evicting the least recently used entries first.",
+    )
+    argparser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes to parse inputs and render outputs with, and of threads to write outputs with. 0 uses one per CPU.",
     )
 
     return argparser, argparser.parse_args(args)
@@ -165,24 +512,23 @@ def cli_main(raw_args):
     if not (args.certdata_input or args.ca_bundle_input):
         argparser.print_help()
         return 1
+    if args.ca_unpacked_shard_by and not args.ca_unpacked_output:
+        argparser.error("--ca_unpacked_shard_by requires --ca_unpacked_output")
 
-    db = types.CertDB()
-    for certdata_path in args.certdata_input or []:
-        with open(certdata_path, "rb") as certdata_fp:
-            db.add_nss_objs(nss_parser.Parser().parse_lines(certdata_fp))
+    cache = None
+    if args.cache or args.cache_dir:
+        cache = ingest_cache.IngestCache(
+            args.cache_dir or ingest_cache.default_cache_dir(), args.cache_max_bytes
+        )
+
+    inputs = [("certdata", path) for path in args.certdata_input or []]
     for bundle_path in args.ca_bundle_input or []:
-        if os.path.isfile(bundle_path):
-            bundle_files = [bundle_path]
-        elif os.path.isdir(bundle_path):
-            bundle_files = [
-                os.path.join(bundle_path, f) for f in os.listdir(bundle_path)
-            ]
-            bundle_files = [f for f in bundle_files if os.path.isfile(f)]
-        else:
-            raise FileNotFoundError(f"Bundle not found: {bundle_path}")
-        for f in bundle_files:
-            with open(f) as ca_bundle_fp:
-                db.add_certs(certstore_parser.read_certificates(ca_bundle_fp))
+        inputs.extend(("ca_bundle", f) for f in _bundle_files(bundle_path))
+
+    jobs = args.jobs or os.cpu_count() or 1
+    db = types.CertDB()
+    for records in ingest.load_all(inputs, cache, jobs):
+        db.add_records(records)
 
     blocklist = frozenset()
     if args.blocklist_input:
@@ -193,16 +539,25 @@ def cli_main(raw_args):
         print(f"Certs without trusts: {certs_without_trusts}", file=sys.stderr)
         return 2
 
+    # Dedupe before applying the blocklist, so that nothing can bring back
+    # the trust of a blocklisted certificate. An entry naming a copy that was
+    # merged away then doesn't match anything, and is reported as such.
+    if args.dedupe_policy != "off":
+        for kept, merged in db.dedupe(args.dedupe_policy).items():
+            print(
+                f"Merged duplicate certs into {kept}: {', '.join(merged)}",
+                file=sys.stderr,
+            )
+
     # Remove all trust from any certs in blocklist.
-    # We will allow either the trustmap key, or just the plain label.
+    # We will allow the trustmap key, the plain label, or a fingerprint or
+    # subject hash, which will match every certificate that has it.
     saw_blocklist = set()
-    for key in sorted(db.trustmap.keys()):
-        if key in blocklist:
-            saw_blocklist.add(key)
-            db.trustmap[key] = db.trustmap[key].as_distrusted()
-        elif db.trustmap[key].label in blocklist:
-            saw_blocklist.add(db.trustmap[key].label)
-            db.trustmap[key] = db.trustmap[key].as_distrusted()
+    for entry in blocklist:
+        keys = resolve_blocklist_entry(db, entry)
+        if keys:
+            saw_blocklist.add(entry)
+        db.add_records(db.trustmap[key].as_distrusted() for key in keys)
     unseen_blocklist = blocklist - saw_blocklist
     if unseen_blocklist:
         print(
@@ -211,31 +566,54 @@ def cli_main(raw_args):
         )
         return 3
 
-    did_output = False
     outputs = {
         "p11kit_output": (output_to_file, p11kit_output.P11KitOutput),
         "ca_bundle_output": (output_to_file, certstore_output.OpenSSLCertStoreOutput),
         "ca_unpacked_output": (
-            output_to_dir,
+            functools.partial(output_to_dir, db, jobs=jobs),
             certstore_output.OpenSSLCertStoreOutput,
             ".crt",
+            args.ca_unpacked_shard_by,
         ),
         "ca_standard_bundle_output": (
             output_to_file,
             certstore_output.StandardCertStoreOutput,
         ),
         "ca_hashed_unpacked_output": (
-            output_to_hashed_dir,
+            functools.partial(output_to_hashed_dir, db, jobs=jobs),
             certstore_output.OpenSSLCertStoreOutput,
             ".crt",
         ),
     }
-    for k, v in outputs.items():
-        did_output = v[0](db, args, k, *v[1:]) or did_output
-
-    if not did_output:
+    enabled = {k: v for k, v in outputs.items() if getattr(args, k)}
+    if not enabled:
         argparser.print_help()
         return 1
+
+    # Several outputs share an output class (and so identical text for each
+    # certificate): render each record once per class, then hand the text out.
+    rendered = render(db, dict.fromkeys(v[1] for v in enabled.values()), jobs)
+    writes = [
+        functools.partial(
+            output_fn,
+            rendered[output_cls],
+            getattr(args, k),
+            *extra,
+            incremental=args.incremental_output,
+        )
+        for k, (output_fn, output_cls, *extra) in enabled.items()
+    ]
+    if jobs <= 1:
+        for write in writes:
+            write()
+        return 0
+
+    # Each output goes to its own paths, so they can be written concurrently
+    # without changing what ends up on disk.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(write) for write in writes]
+        for future in futures:
+            future.result()
     return 0
 
 
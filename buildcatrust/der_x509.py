@@ -3,23 +3,61 @@
 # SPDX-License-Identifier: MIT
 
 import base64
+import binascii
+from collections.abc import Iterator
 import dataclasses
 import io
 import re
 import textwrap
 from typing import Protocol, TextIO
+import weakref
 
 
-def _decode_len(i: bytes) -> tuple[int, bytes, bytes]:
-    if i[0] > 0x80:
-        length_length = i[0] & 0x7F
-        return (
-            int.from_bytes(i[1 : 1 + length_length], "big"),
-            i[: 1 + length_length],
-            i[1 + length_length :],
-        )
-    else:
-        return i[0], i[:1], i[1:]
+class ParseError(Exception):
+    pass
+
+
+# The decoders below all work on a buffer (usually a memoryview) plus integer
+# offsets into it, rather than slicing off a fresh copy of the remaining input
+# at every step. Only the fields we actually keep are turned into bytes.
+#
+# Every helper takes the offset to start reading at and the offset the value
+# must end before, and returns the offset just past what it consumed.
+
+
+def _decode_len(buf, pos: int, end: int) -> tuple[int, int]:
+    """Decodes a DER length at buf[pos], returning (length, content offset)."""
+    if pos >= end:
+        raise ParseError("truncated DER length")
+    first = buf[pos]
+    if first < 0x80:
+        return first, pos + 1
+    length_length = first & 0x7F
+    if length_length == 0:
+        raise ParseError("indefinite lengths are not permitted in DER")
+    if pos + 1 + length_length > end:
+        raise ParseError("truncated DER length")
+    return (
+        int.from_bytes(buf[pos + 1 : pos + 1 + length_length], "big"),
+        pos + 1 + length_length,
+    )
+
+
+def _read_tlv(buf, pos: int, end: int) -> tuple[int, int, int]:
+    """Reads the header at buf[pos], returning (tag, content start, content end)."""
+    if pos >= end:
+        raise ParseError("truncated DER value")
+    tag = buf[pos]
+    length, content_start = _decode_len(buf, pos + 1, end)
+    content_end = content_start + length
+    if content_end > end:
+        raise ParseError(f"DER value with tag {tag:#x} overruns its container")
+    return tag, content_start, content_end
+
+
+def _dumb_decode(buf, pos: int, end: int) -> tuple[tuple[int, bytes], int]:
+    tag, _, value_end = _read_tlv(buf, pos, end)
+    return (tag, bytes(buf[pos:value_end])), value_end
 
 
 def _encode_len(n: int) -> bytearray:
@@ -33,13 +71,13 @@ def _encode_len(n: int) -> bytearray:
 
 
 def der_int_to_python(i: bytes) -> tuple[int, bytes, bytes]:
-    assert i[0] == 0x02
-    length, length_bytes, data = _decode_len(i[1:])
-    assert len(data) == length
+    buf = memoryview(i)
+    tag, content_start, content_end = _read_tlv(buf, 0, len(buf))
+    assert tag == 0x02
     return (
-        int.from_bytes(data, "big"),
-        i[:1] + length_bytes + data[:length],
-        data[length:],
+        int.from_bytes(buf[content_start:content_end], "big"),
+        bytes(buf[:content_end]),
+        bytes(buf[content_end:]),
     )
 
 
@@ -57,29 +95,55 @@ def _encode_int(n: int) -> bytearray:
     return nbuf[::-1]
 
 
-def _decode_int(b: bytes) -> tuple[int, bytes]:
-    if b[0] < 0x80:
-        return int(b[0]), b[1:]
-
+def _decode_int_at(buf, pos: int, end: int) -> tuple[int, int]:
     n = 0
-    pos = 0
     while True:
-        n = (n << 7) | (b[pos] & 0x7F)
-        if (b[pos] & 0x80) == 0:
-            return n, b[pos + 1 :]
+        if pos >= end:
+            raise ParseError("truncated base-128 integer")
+        octet = buf[pos]
         pos += 1
+        n = (n << 7) | (octet & 0x7F)
+        if (octet & 0x80) == 0:
+            return n, pos
+
+
+def _decode_int(b: bytes) -> tuple[int, bytes]:
+    n, pos = _decode_int_at(b, 0, len(b))
+    return n, b[pos:]
+
+
+# Decoded ObjectIDs and DistinguishedNames are shared between every place
+# that has the same DER encoding, for as long as anything is still using them.
+_OBJECT_ID_POOL: "weakref.WeakValueDictionary[bytes, ObjectID]" = (
+    weakref.WeakValueDictionary()
+)
+_DISTINGUISHED_NAME_POOL: "weakref.WeakValueDictionary[bytes, DistinguishedName]" = (
+    weakref.WeakValueDictionary()
+)
+
 
+# Well-known ObjectIDs (with their names), by DER encoding. Decoding any of
+# these returns the registered instance.
+_KNOWN_OBJECT_IDS: "dict[bytes, ObjectID]" = {}
 
-def _dumb_decode(i: bytes) -> tuple[tuple[int, bytes], bytes]:
-    tag = i[0]
-    der_len, length_bytes, buf = _decode_len(i[1:])
-    return (tag, i[:1] + length_bytes + buf[:der_len]), buf[der_len:]
 
+def register_object_id(oid: "ObjectID") -> "ObjectID":
+    return _KNOWN_OBJECT_IDS.setdefault(oid.as_der(), oid)
 
-@dataclasses.dataclass(frozen=True, order=True)
+
+@dataclasses.dataclass(frozen=True, order=True, slots=True, weakref_slot=True)
 class ObjectID:
     name: str | None
-    oid: list[int]
+    oid: tuple[int, ...]
+
+    # The DER encoding, filled in on first use.
+    _der: bytes | None = dataclasses.field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self):
+        if not isinstance(self.oid, tuple):
+            object.__setattr__(self, "oid", tuple(self.oid))
 
     def __str__(self) -> str:
         return ".".join(str(s) for s in self.oid)
@@ -98,33 +162,52 @@ class ObjectID:
 
     @classmethod
     def from_str(cls, name: str | None, oid: str) -> "ObjectID":
-        return cls(name=name, oid=[int(s) for s in oid.split(".")])
+        return cls(name=name, oid=tuple(int(s) for s in oid.split(".")))
 
     def as_der(self) -> bytes:
+        if self._der is not None:
+            return self._der
         buf = bytearray()
-        buf.append((40 * self.oid[0]) + self.oid[1])
+        buf.extend(_encode_int((40 * self.oid[0]) + self.oid[1]))
         for n in self.oid[2:]:
             buf.extend(_encode_int(n))
 
         prefix = bytearray([0x06])
         prefix.extend(_encode_len(len(buf)))
-        return bytes(prefix + buf)
+        der = bytes(prefix + buf)
+        object.__setattr__(self, "_der", der)
+        return der
 
     @classmethod
     def from_der(cls, b: bytes) -> tuple["ObjectID", bytes]:
-        assert b[0] == 0x06
-        oid_len, _, b = _decode_len(b[1:])
-        b, trailing = b[:oid_len], b[oid_len:]
-
-        oid = []
-        oid.append(min(b[0] // 40, 2))
-        oid.append(b[0] - (oid[0] * 40))
-        b = b[1:]
-        while b:
-            oid_seg, b = _decode_int(b)
+        buf = memoryview(b)
+        oid, pos = cls._from_der_at(buf, 0, len(buf))
+        return oid, bytes(buf[pos:])
+
+    @classmethod
+    def _from_der_at(cls, buf, pos: int, end: int) -> tuple["ObjectID", int]:
+        oid_start = pos
+        tag, pos, oid_end = _read_tlv(buf, pos, end)
+        assert tag == 0x06
+        if pos == oid_end:
+            raise ParseError("empty OBJECT IDENTIFIER")
+        der = bytes(buf[oid_start:oid_end])
+        known = _KNOWN_OBJECT_IDS.get(der) or _OBJECT_ID_POOL.get(der)
+        if known is not None:
+            return known, oid_end
+
+        # The first two arcs are packed into a single subidentifier.
+        first, pos = _decode_int_at(buf, pos, oid_end)
+        oid = [min(first // 40, 2)]
+        oid.append(first - (oid[0] * 40))
+        while pos < oid_end:
+            oid_seg, pos = _decode_int_at(buf, pos, oid_end)
             oid.append(oid_seg)
 
-        return cls(name=None, oid=oid), trailing
+        object_id = cls(name=None, oid=tuple(oid))
+        object.__setattr__(object_id, "_der", der)
+        _OBJECT_ID_POOL[der] = object_id
+        return object_id, oid_end
 
 
 @dataclasses.dataclass(frozen=True)
@@ -132,13 +215,7 @@ class ExtendedKeyUsages:
     oids: list[ObjectID]
 
     def as_der(self) -> bytes:
-        buf = bytearray()
-        for oid in self.oids:
-            buf.extend(oid.as_der())
-
-        prefix = bytearray([0x30])
-        prefix.extend(_encode_len(len(buf)))
-        return bytes(prefix + buf)
+        return OpenSSLCertAux.encode_oids(self.oids)
 
 
 class DerSerializable(Protocol):
@@ -172,72 +249,84 @@ class CertExtension:
         return bytes(prefix + buf)
 
 
+def _tbs_field(index: int) -> property:
+    def get(self: "TBSCertificate") -> bytes | None:
+        start, end = self.offsets[2 * index : 2 * index + 2]
+        if start == end:
+            return None
+        return self.buf[start:end]
+
+    return property(get)
+
+
 @dataclasses.dataclass(frozen=True)
 class TBSCertificate:
-    serial_number: bytes
-    signature: bytes
-    issuer: bytes
-    validity: bytes
-    subject: bytes
-    subject_public_key_info: bytes
-
-    version: bytes | None = None
-    issuer_unique_id: bytes | None = None
-    subject_unique_id: bytes | None = None
-    extensions: bytes | None = None
+    """A lazily decoded view of a TBSCertificate.
+
+    Decoding only walks the field headers once, recording where each field
+    starts and ends in buf. The fields themselves are sliced out of the
+    buffer when (and if) they're read.
+    """
+
+    buf: bytes
+    # (start, end) offsets into buf for each of the fields below, flattened
+    # into a single tuple. Missing optional fields are recorded as (0, 0).
+    offsets: tuple[int, ...]
+
+    version = _tbs_field(0)
+    serial_number = _tbs_field(1)
+    signature = _tbs_field(2)
+    issuer = _tbs_field(3)
+    validity = _tbs_field(4)
+    subject = _tbs_field(5)
+    subject_public_key_info = _tbs_field(6)
+    issuer_unique_id = _tbs_field(7)
+    subject_unique_id = _tbs_field(8)
+    extensions = _tbs_field(9)
 
     @classmethod
     def from_der(cls, b: bytes) -> tuple["TBSCertificate", bytes]:
-        assert b[0] == 0x30
-        cert_len, _, b = _decode_len(b[1:])
-        b, rem = b[:cert_len], b[cert_len:]
+        b = bytes(b)
+        tbs, pos = cls._from_der_at(b, 0, len(b))
+        return tbs, b[pos:]
 
-        data = {}
+    @classmethod
+    def _from_der_at(
+        cls, buf: bytes, pos: int, end: int
+    ) -> tuple["TBSCertificate", int]:
+        tag, pos, end = _read_tlv(buf, pos, end)
+        assert tag == 0x30
 
-        (tag, dec_bytes), b = _dumb_decode(b)
-        if tag == 0xA0:
-            data["version"] = dec_bytes
+        offsets = []
 
-            (tag, dec_bytes), b = _dumb_decode(b)
-        assert tag == 0x02
-        data["serial_number"] = dec_bytes
+        def read_field() -> int:
+            nonlocal pos
+            tag, _, field_end = _read_tlv(buf, pos, end)
+            offsets.extend((pos, field_end))
+            pos = field_end
+            return tag
 
-        (tag, dec_bytes), b = _dumb_decode(b)
-        assert tag == 0x30
-        data["signature"] = dec_bytes
+        def skip_field() -> None:
+            offsets.extend((0, 0))
 
-        (tag, dec_bytes), b = _dumb_decode(b)
-        assert tag == 0x30
-        data["issuer"] = dec_bytes
-
-        (tag, dec_bytes), b = _dumb_decode(b)
-        assert tag == 0x30
-        data["validity"] = dec_bytes
+        if pos < end and buf[pos] == 0xA0:
+            read_field()  # version
+        else:
+            skip_field()
+        assert read_field() == 0x02  # serial_number
+        assert read_field() == 0x30  # signature
+        assert read_field() == 0x30  # issuer
+        assert read_field() == 0x30  # validity
+        assert read_field() == 0x30  # subject
+        assert read_field() == 0x30  # subject_public_key_info
 
-        (tag, dec_bytes), b = _dumb_decode(b)
-        assert tag == 0x30
-        data["subject"] = dec_bytes
+        for tag in (0xA1, 0xA2, 0xA3):
+            if pos < end and buf[pos] == tag:
+                read_field()
+            else:
+                skip_field()
 
-        (tag, dec_bytes), b = _dumb_decode(b)
-        assert tag == 0x30
-        data["subject_public_key_info"] = dec_bytes
-
-        if b:
-            (tag, dec_bytes), b = _dumb_decode(b)
-            if tag == 0xA1:
-                data["issuer_unique_id"] = dec_bytes
-                if b:
-                    (tag, dec_bytes), b = _dumb_decode(b)
-            if tag == 0xA2:
-                data["subject_unique_id"] = dec_bytes
-                if b:
-                    (tag, dec_bytes), b = _dumb_decode(b)
-            if tag == 0xA3:
-                data["extensions"] = dec_bytes
-                if b:
-                    (tag, dec_bytes), b = _dumb_decode(b)
-
-        return cls(**data), rem
+        return cls(buf=buf, offsets=tuple(offsets)), end
 
 
 @dataclasses.dataclass(frozen=True)
@@ -245,29 +334,44 @@ class Certificate:
     tbs_certificate: TBSCertificate
     signature_algorithm: bytes
     signature_value: bytes
+    der: bytes
 
     @classmethod
     def from_der(cls, b: bytes) -> tuple["Certificate", bytes]:
-        assert b[0] == 0x30  # sequence
-        cert_len, _, b = _decode_len(b[1:])
-        b, rem = b[:cert_len], b[cert_len:]
-        tbs_certificate, b = TBSCertificate.from_der(b)
+        b = bytes(b)
+        cert, pos = cls._from_der_at(b, 0, len(b))
+        return cert, b[pos:]
+
+    @classmethod
+    def _from_der_at(cls, buf, pos: int, end: int) -> tuple["Certificate", int]:
+        cert_start = pos
+        tag, pos, end = _read_tlv(buf, pos, end)
+        assert tag == 0x30  # sequence
+
+        # Take a single copy of the certificate (if buf is exactly the
+        # certificate, this doesn't copy at all) and have the TBSCertificate
+        # view refer into it.
+        der = bytes(buf[cert_start:end])
+        tbs_certificate, pos = TBSCertificate._from_der_at(
+            der, pos - cert_start, end - cert_start
+        )
 
-        (tag, signature_algorithm), b = _dumb_decode(b)
+        (tag, signature_algorithm), pos = _dumb_decode(der, pos, len(der))
         assert tag == 0x30
 
-        (tag, signature_value), b = _dumb_decode(b)
+        (tag, signature_value), pos = _dumb_decode(der, pos, len(der))
         assert tag == 0x03
 
-        assert not b
+        assert pos == len(der)
 
         return (
             cls(
                 tbs_certificate=tbs_certificate,
                 signature_algorithm=signature_algorithm,
                 signature_value=signature_value,
+                der=der,
             ),
-            rem,
+            end,
         )
 
     def public_key_pem(self) -> "PEMBlock":
@@ -276,6 +380,26 @@ class Certificate:
         )
 
 
+# Matches a whole PEM block, from its BEGIN line up to the matching END line,
+# capturing the block name and the base64 between the two.
+#
+# Base64 never contains "-", so the body is first tried as a single run of
+# non-"-" characters, which the regex engine can skip over quickly. Anything
+# else (e.g. RFC 1421 headers) falls back to scanning for the END line.
+_PEM_BEGIN_RE = re.compile(rb"^-----BEGIN ([^-\r\n]+)-----\r?$", re.MULTILINE)
+_PEM_END_RE = re.compile(rb"^-----END ([^-\r\n]+)-----\r?$", re.MULTILINE)
+_PEM_HEADERS_END_RE = re.compile(rb"\r?\n\r?\n")
+
+
+def _pem_body(body: bytes) -> bytes:
+    # Skip RFC 1421 style "Name: value" headers, which end at a blank line.
+    first_line = body.lstrip(b"\r\n").split(b"\n", 1)[0]
+    if b":" in first_line:
+        m = _PEM_HEADERS_END_RE.search(body, body.index(first_line))
+        body = body[m.end() :] if m else b""
+    return body
+
+
 @dataclasses.dataclass(frozen=True)
 class PEMBlock:
     name: str
@@ -326,6 +450,32 @@ class PEMBlock:
             return None
         return "".join(prefix), cls(name=name, content=base64.b64decode("".join(bits)))
 
+    @classmethod
+    def decode_all(cls, buf: bytes) -> Iterator["PEMBlock"]:
+        """Decodes every PEM block in buf, skipping anything between blocks.
+
+        buf can be any bytes-like object that supports regular expression
+        matching, including an mmap.
+        """
+        pos = 0
+        end = None
+        while (begin := _PEM_BEGIN_RE.search(buf, pos)) is not None:
+            # Only look for the next END once we're past the last one we found,
+            # so truncated or unterminated blocks don't cost a scan each.
+            if end is None or end.start() < begin.end():
+                end = _PEM_END_RE.search(buf, begin.end())
+                if end is None:
+                    return
+            if end.group(1) != begin.group(1):
+                # This BEGIN is never closed: try the next one.
+                pos = begin.end()
+                continue
+            yield cls(
+                name=begin.group(1).decode("utf-8"),
+                content=binascii.a2b_base64(_pem_body(buf[begin.end() : end.start()])),
+            )
+            pos = end.end()
+
 
 @dataclasses.dataclass(frozen=True)
 class OpenSSLCertAux:
@@ -334,12 +484,8 @@ class OpenSSLCertAux:
 
     @staticmethod
     def encode_oids(oids: list[ObjectID], tag: int = 0x30) -> bytes:
-        buf = bytearray()
-        for oid in oids:
-            buf.extend(oid.as_der())
-        prefix = bytearray([tag])
-        prefix.extend(_encode_len(len(buf)))
-        return bytes(prefix + buf)
+        buf = b"".join(oid.as_der() for oid in oids)
+        return bytes([tag]) + _encode_len(len(buf)) + buf
 
     def as_der(self) -> bytes:
         buf = bytearray()
@@ -353,75 +499,108 @@ class OpenSSLCertAux:
 
     @classmethod
     def from_der(cls, b: bytes) -> tuple["OpenSSLCertAux", bytes]:
-        assert b[0] == 0x30  # sequence
-        aux_len, _, b = _decode_len(b[1:])
-        b, rem = b[:aux_len], b[aux_len:]
-
-        assert b[0] == 0x30  # sequence, trust
-        trust_len, _, b = _decode_len(b[1:])
-        trust_b, b = b[:trust_len], b[trust_len:]
-        trust = []
-        while trust_b:
-            trust_oid, trust_b = ObjectID.from_der(trust_b)
-            trust.append(trust_oid)
+        buf = memoryview(b)
+        cert_aux, pos = cls._from_der_at(buf, 0, len(buf))
+        return cert_aux, bytes(buf[pos:])
+
+    @staticmethod
+    def _decode_oids(buf, pos: int, end: int) -> list[ObjectID]:
+        oids = []
+        while pos < end:
+            oid, pos = ObjectID._from_der_at(buf, pos, end)
+            oids.append(oid)
+        return oids
+
+    @classmethod
+    def _from_der_at(cls, buf, pos: int, end: int) -> tuple["OpenSSLCertAux", int]:
+        tag, pos, end = _read_tlv(buf, pos, end)
+        assert tag == 0x30  # sequence
+
+        tag, trust_start, pos = _read_tlv(buf, pos, end)
+        assert tag == 0x30  # sequence, trust
+        trust = cls._decode_oids(buf, trust_start, pos)
 
         reject = []
-        if b and b[0] == 0xA0:  # sequence, reject (a0 tag)
-            reject_len, _, b = _decode_len(b[1:])
-            reject_b, b = b[:reject_len], b[reject_len:]
-            while reject_b:
-                reject_oid, reject_b = ObjectID.from_der(reject_b)
-                reject.append(reject_oid)
+        if pos < end and buf[pos] == 0xA0:  # sequence, reject (a0 tag)
+            _, reject_start, pos = _read_tlv(buf, pos, end)
+            reject = cls._decode_oids(buf, reject_start, pos)
 
-        return cls(trust=trust, reject=reject), rem
+        return cls(trust=trust, reject=reject), end
 
 
 def to_trusted_certificate(cert: bytes, certaux: OpenSSLCertAux) -> PEMBlock:
     return PEMBlock(name="TRUSTED CERTIFICATE", content=cert + certaux.as_der())
 
 
-def parse_trusted_certificate(pb: PEMBlock) -> tuple[bytes, OpenSSLCertAux, bytes]:
+def decode_trusted_certificate(
+    pb: PEMBlock,
+) -> tuple[Certificate, OpenSSLCertAux, bytes]:
     assert pb.name == "TRUSTED CERTIFICATE"
-    # TODO(lukegb): make this less bad: we parse the cert then throw it away
-    # this is because I don't want to ensure that we're parsing the cert "properly"
-    cert, trailing = Certificate.from_der(pb.content)
-    cert_bytes = pb.content[: len(pb.content) - len(trailing)]
-    cert_aux, trailing = OpenSSLCertAux.from_der(trailing)
-    return cert_bytes, cert_aux, trailing
+    buf = memoryview(pb.content)
+    cert, pos = Certificate._from_der_at(buf, 0, len(buf))
+    cert_aux, pos = OpenSSLCertAux._from_der_at(buf, pos, len(buf))
+    return cert, cert_aux, bytes(buf[pos:])
 
 
-@dataclasses.dataclass(frozen=True)
+def parse_trusted_certificate(pb: PEMBlock) -> tuple[bytes, OpenSSLCertAux, bytes]:
+    cert, cert_aux, trailing = decode_trusted_certificate(pb)
+    return cert.der, cert_aux, trailing
+
+
+@dataclasses.dataclass(frozen=True, slots=True, weakref_slot=True)
 class DistinguishedName:
     bits: list[list[tuple[ObjectID, str]]]
     der: bytes
 
+    @classmethod
+    def _interned(
+        cls, bits: list[list[tuple[ObjectID, str]]], der: bytes
+    ) -> "DistinguishedName":
+        dn = _DISTINGUISHED_NAME_POOL.get(der)
+        if dn is None:
+            dn = _DISTINGUISHED_NAME_POOL[der] = cls(bits=bits, der=der)
+        return dn
+
+    def __reduce__(self):
+        # Keep sharing names with the rest of the process after unpickling.
+        return (type(self)._interned, (self.bits, self.der))
+
     @classmethod
     def from_der(cls, b: bytes) -> tuple["DistinguishedName", bytes]:
-        assert b[0] == 0x30
-        dn_len, len_b, b = _decode_len(b[1:])
-        b, rem = b[:dn_len], b[dn_len:]
-        original_der = b"\x30" + len_b + b
+        buf = memoryview(b)
+        dn, pos = cls._from_der_at(buf, 0, len(buf))
+        return dn, bytes(buf[pos:])
+
+    @classmethod
+    def _from_der_at(cls, buf, pos: int, end: int) -> tuple["DistinguishedName", int]:
+        dn_start = pos
+        tag, pos, end = _read_tlv(buf, pos, end)
+        assert tag == 0x30
+        original_der = bytes(buf[dn_start:end])
+        dn = _DISTINGUISHED_NAME_POOL.get(original_der)
+        if dn is not None:
+            return dn, end
 
         bits = []
-        while b:
-            assert b[0] == 0x31
-            set_len, _, set_b = _decode_len(b[1:])
-            set_b, b = set_b[:set_len], set_b[set_len:]
+        while pos < end:
+            tag, set_pos, pos = _read_tlv(buf, pos, end)
+            assert tag == 0x31
 
             set_bits = []
-            while set_b:
-                assert set_b[0] == 0x30
-                seq_len, _, seq_b = _decode_len(set_b[1:])
-                seq_b, set_b = seq_b[:seq_len], seq_b[seq_len:]
-
-                seq_oid, seq_b = ObjectID.from_der(seq_b)
-                assert seq_b[0] in (0x13, 0x14, 0x0C, 0x16)
-                part_len, _, seq_b = _decode_len(seq_b[1:])
-                part_b, seq_b = seq_b[:seq_len], seq_b[seq_len:]
-                assert seq_b == b"", "DN seq contained >2 parts"
-                set_bits.append((seq_oid, part_b.decode("utf-8")))
+            while set_pos < pos:
+                tag, seq_pos, seq_end = _read_tlv(buf, set_pos, pos)
+                assert tag == 0x30
+                set_pos = seq_end
+
+                seq_oid, seq_pos = ObjectID._from_der_at(buf, seq_pos, seq_end)
+                tag, part_start, part_end = _read_tlv(buf, seq_pos, seq_end)
+                assert tag in (0x13, 0x14, 0x0C, 0x16)
+                assert part_end == seq_end, "DN seq contained >2 parts"
+                set_bits.append(
+                    (seq_oid, bytes(buf[part_start:part_end]).decode("utf-8"))
+                )
             bits.append(set_bits)
-        return cls(bits=bits, der=original_der), rem
+        return cls._interned(bits, original_der), end
 
     def as_der(self) -> bytes:
         return self.der
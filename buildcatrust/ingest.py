@@ -0,0 +1,172 @@
+# SPDX-FileCopyrightText: 2021 the buildcatrust authors
+#
+# SPDX-License-Identifier: MIT
+
+"""Turns input files into Certificate and Trust records."""
+
+from collections.abc import Iterator
+from collections.abc import Sequence
+import concurrent.futures
+import os
+from typing import Callable
+
+from . import certstore_parser
+from . import ingest_cache
+from . import nss_parser
+from . import types
+
+Record = types.Certificate | types.Trust
+
+
+def parse_certdata(data: bytes) -> list[Record]:
+    parser = nss_parser.Parser(classes=types.PARSER_CLASSES)
+    objs = parser.feed(data)
+    objs.extend(parser.close())
+    return types.from_parser_objects(objs)
+
+
+def parse_ca_bundle(buf: bytes) -> list[Record]:
+    records = []
+    for cert, trust in certstore_parser.read_certificates_from_buffer(buf):
+        records.extend((cert, trust))
+    return records
+
+
+def _cached(
+    cache: ingest_cache.IngestCache | None,
+    kind: str,
+    buf: bytes,
+    parse: Callable[[bytes], list[Record]],
+) -> list[Record]:
+    if cache is None:
+        return parse(buf)
+    key = cache.key(kind, buf)
+    records = cache.get(key)
+    if records is None:
+        records = parse(buf)
+        cache.put(key, records)
+    return records
+
+
+def load_certdata(
+    path: str | os.PathLike, cache: ingest_cache.IngestCache | None = None
+) -> list[Record]:
+    with open(path, "rb") as fp:
+        data = fp.read()
+    return _cached(cache, "certdata", data, parse_certdata)
+
+
+def load_ca_bundle(
+    path: str | os.PathLike, cache: ingest_cache.IngestCache | None = None
+) -> list[Record]:
+    with certstore_parser.open_buffer(path) as buf:
+        return _cached(cache, "ca_bundle", buf, parse_ca_bundle)
+
+
+_LOADERS = {
+    "certdata": load_certdata,
+    "ca_bundle": load_ca_bundle,
+}
+
+# Below this many objects a shard isn't worth sending to another process:
+# shipping it there and its records back costs more than parsing it.
+MIN_OBJECTS_PER_SHARD = 512
+
+
+def parse_certdata_shard(shard: bytes, in_data: bool) -> list[Record]:
+    parser = nss_parser.Parser(in_data=in_data, classes=types.PARSER_CLASSES)
+    objs = parser.feed(shard)
+    objs.extend(parser.close())
+    return types.from_parser_objects(objs)
+
+
+def certdata_shards(data: bytes, max_shards: int) -> list[bytes]:
+    """Cuts a certdata file into at most max_shards pieces on object boundaries.
+
+    The first piece holds everything up to and including BEGINDATA; the rest
+    start on an object, and should be parsed with in_data set.
+    """
+    offsets = nss_parser.object_offsets(data)
+    shards = min(max_shards, len(offsets) // MIN_OBJECTS_PER_SHARD)
+    if shards <= 1:
+        return [data]
+    cuts = [offsets[len(offsets) * n // shards] for n in range(1, shards)]
+    cuts = [0, *cuts, len(data)]
+    return [data[start:end] for start, end in zip(cuts, cuts[1:])]
+
+
+def _load_batch(
+    inputs: Sequence[tuple[str, str | os.PathLike]],
+    cache: ingest_cache.IngestCache | None,
+) -> list[list[Record]]:
+    return [_LOADERS[kind](path, cache) for kind, path in inputs]
+
+
+def _submit_certdata(
+    executor: concurrent.futures.Executor,
+    path: str | os.PathLike,
+    cache: ingest_cache.IngestCache | None,
+    max_shards: int,
+) -> Callable[[], list[list[Record]]]:
+    with open(path, "rb") as fp:
+        data = fp.read()
+    key = None
+    if cache is not None:
+        key = cache.key("certdata", data)
+        records = cache.get(key)
+        if records is not None:
+            return lambda: [records]
+
+    futures = [
+        executor.submit(parse_certdata_shard, shard, n > 0)
+        for n, shard in enumerate(certdata_shards(data, max_shards))
+    ]
+
+    def result() -> list[list[Record]]:
+        records = [record for f in futures for record in f.result()]
+        if cache is not None:
+            cache.put(key, records)
+        return [records]
+
+    return result
+
+
+def load_all(
+    inputs: Sequence[tuple[str, str | os.PathLike]],
+    cache: ingest_cache.IngestCache | None = None,
+    jobs: int = 1,
+) -> Iterator[list[Record]]:
+    """Loads each (kind, path) input, yielding their records in input order.
+
+    With jobs > 1 the inputs are parsed in a pool of worker processes, and
+    large certdata files are split into shards that are parsed in parallel.
+    The results are still yielded in the order the inputs were given, so
+    merging them gives the same result as loading them one at a time.
+    """
+    if jobs <= 1:
+        for kind, path in inputs:
+            yield _LOADERS[kind](path, cache)
+        return
+
+    # Bundle directories can hold thousands of tiny files; hand them out in
+    # batches so we aren't dominated by per-task overhead.
+    batch_size = max(1, len(inputs) // (jobs * 4))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = []  # type: list[Callable[[], list[list[Record]]]]
+        batch = []  # type: list[tuple[str, str | os.PathLike]]
+        for kind, path in inputs:
+            if kind == "certdata":
+                if batch:
+                    pending.append(executor.submit(_load_batch, batch, cache).result)
+                    batch = []
+                pending.append(_submit_certdata(executor, path, cache, jobs))
+                continue
+            batch.append((kind, path))
+            if len(batch) >= batch_size:
+                pending.append(executor.submit(_load_batch, batch, cache).result)
+                batch = []
+        if batch:
+            pending.append(executor.submit(_load_batch, batch, cache).result)
+
+        for result in pending:
+            yield from result()
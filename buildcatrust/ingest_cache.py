@@ -0,0 +1,237 @@
+# SPDX-FileCopyrightText: 2021 the buildcatrust authors
+#
+# SPDX-License-Identifier: MIT
+
+"""An on-disk cache of parsed inputs, keyed by the content of each input.
+
+Entries hold nothing but strings, bytes, ints and tuples, written with
+marshal, and the records are rebuilt from them on load, so reading an entry
+can't run code. An entry can still claim anything at all about trust, so the
+cache is off unless asked for, and its directory must be writable only by
+people trusted as much as the inputs.
+"""
+
+import hashlib
+import marshal
+import os
+import os.path
+import sys
+import tempfile
+
+from . import __version__
+from . import der_x509
+from . import enums
+from . import types
+
+# Bump this whenever the entry format below, or the meaning of anything in
+# it, changes in a way that __version__ alone wouldn't capture.
+CACHE_FORMAT_VERSION = 6
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+_ENTRY_SUFFIX = ".marshal"
+
+Record = types.Certificate | types.Trust
+
+# Each record is stored as a tuple of its constructor's arguments, tagged
+# with its type; names are stored as DER and trust as (attribute, TrustType
+# value) pairs for each purpose that isn't UNKNOWN.
+_CERTIFICATE = "certificate"
+_TRUST = "trust"
+_OPTIONAL_BYTES = (bytes, type(None))
+_ENTRY_TYPES = {
+    _CERTIFICATE: (
+        str,
+        str,
+        bytes,
+        # CKA_ID is a string in certdata, but bundle certificates use bytes.
+        (str, bytes),
+        bytes,
+        bytes,
+        bytes,
+        bool,
+        _OPTIONAL_BYTES,
+        _OPTIONAL_BYTES,
+    ),
+    _TRUST: (str, str, bytes, bytes, bool, tuple),
+}
+
+
+def _dump_record(record: Record) -> tuple:
+    if isinstance(record, types.Certificate):
+        return (
+            _CERTIFICATE,
+            record.label,
+            record.subject.der,
+            record.id,
+            record.issuer.der,
+            record.serial_number,
+            record.value,
+            record.mozilla_ca_policy,
+            record.server_distrust_after,
+            record.email_distrust_after,
+        )
+    if isinstance(record, types.Trust):
+        trust_values = tuple(
+            (attr, getattr(record, attr).value)
+            for attr in types.Trust.TRUST_ATTRS
+            if getattr(record, attr) != enums.TrustType.UNKNOWN
+        )
+        return (
+            _TRUST,
+            record.label,
+            record.issuer.der,
+            record.serial_number,
+            record.trust_step_up_approved,
+            trust_values,
+        )
+    raise TypeError(f"can't cache a {type(record).__name__}")
+
+
+def _dn_from_der(b: bytes) -> der_x509.DistinguishedName:
+    dn, rem = der_x509.DistinguishedName.from_der(b)
+    if rem:
+        raise ValueError("trailing data after distinguished name")
+    return dn
+
+
+def _load_record(entry: tuple) -> Record:
+    if not (isinstance(entry, tuple) and entry and entry[0] in _ENTRY_TYPES):
+        raise ValueError(f"unknown record {entry!r:.40}")
+    entry_types = _ENTRY_TYPES[entry[0]]
+    if len(entry) != len(entry_types) or not all(
+        isinstance(v, t) for v, t in zip(entry, entry_types)
+    ):
+        raise ValueError(f"malformed {entry[0]} record")
+    if entry[0] == _CERTIFICATE:
+        (_, label, subject, cert_id, issuer, serial_number, value, *rest) = entry
+        mozilla_ca_policy, server_distrust_after, email_distrust_after = rest
+        return types.Certificate(
+            label=sys.intern(label),
+            subject=_dn_from_der(subject),
+            id=cert_id,
+            issuer=_dn_from_der(issuer),
+            serial_number=serial_number,
+            value=value,
+            mozilla_ca_policy=mozilla_ca_policy,
+            server_distrust_after=server_distrust_after,
+            email_distrust_after=email_distrust_after,
+        )
+    (_, label, issuer, serial_number, trust_step_up_approved, trust_values) = entry
+    trust = {}
+    for attr, value in trust_values:
+        if attr not in types.Trust.TRUST_ATTRS:
+            raise ValueError(f"unknown trust attribute {attr!r}")
+        trust[attr] = enums.TrustType(value)
+    return types.Trust(
+        label=sys.intern(label),
+        issuer=_dn_from_der(issuer),
+        serial_number=serial_number,
+        trust_step_up_approved=trust_step_up_approved,
+        **trust,
+    )
+
+
+def default_cache_dir() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_home, "buildcatrust")
+
+
+class IngestCache:
+    """Stores parsed records on disk, evicting the least recently used entries.
+
+    The cache is strictly best-effort: if the cache directory can't be
+    created or written to, or records can't be stored or loaded, it's simply
+    treated as a miss.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(kind: str, data: bytes) -> str:
+        prefix = f"{CACHE_FORMAT_VERSION}:{__version__}:{kind}:"
+        h = hashlib.sha256(prefix.encode("utf-8"))
+        h.update(data)
+        return h.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{_ENTRY_SUFFIX}")
+
+    def get(self, key: str) -> list[Record] | None:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as fp:
+                entries = marshal.load(fp)
+            if not isinstance(entries, list):
+                raise ValueError("cache entry isn't a list of records")
+            records = [_load_record(entry) for entry in entries]
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Corrupt or from an incompatible version: drop it and reparse.
+            self._remove(path)
+            return None
+        try:
+            # Mark the entry as recently used.
+            os.utime(path)
+        except OSError:
+            pass
+        return records
+
+    def put(self, key: str, records: list[Record]) -> None:
+        try:
+            data = marshal.dumps([_dump_record(record) for record in records])
+        except (TypeError, ValueError):
+            # Not something we know how to store: we'll just parse again.
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(
+                dir=self.cache_dir, prefix=".tmp-", suffix=_ENTRY_SUFFIX
+            )
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                fp.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            # Couldn't write it: we'll just parse again next time.
+            self._remove(tmp_path)
+            return
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if entry.name.startswith(".") or not entry.name.endswith(
+                        _ENTRY_SUFFIX
+                    ):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime_ns, st.st_size, entry.path))
+        except OSError:
+            return
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
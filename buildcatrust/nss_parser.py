@@ -2,7 +2,10 @@
 #
 # SPDX-License-Identifier: MIT
 
+from collections.abc import Collection
 from collections.abc import Iterable
+from collections.abc import Iterator
+from collections.abc import Mapping
 import enum
 import re
 from typing import Union
@@ -16,6 +19,7 @@ class ParserState(enum.Enum):
     OBJECT_AWAIT_TYPE = enum.auto()
     OBJECT_AWAIT_VALUE = enum.auto()
     OBJECT_AWAIT_MULTILINE_OCTAL_VALUE = enum.auto()
+    OBJECT_SKIP_MULTILINE_OCTAL_VALUE = enum.auto()
 
 
 class ParseError(Exception):
@@ -23,7 +27,121 @@ class ParseError(Exception):
 
 
 ParsedValue = Union[bool, enums.ObjectType, str, bytes, enums.TrustType]
-ParsedObject = dict[bytes, ParsedValue]
+
+# Attribute names are interned to small integers, in the order they're first
+# seen. The ones certdata.txt uses are registered up front, most common first.
+_ATTRIBUTE_NAMES = [
+    b"CKA_CLASS",
+    b"CKA_TOKEN",
+    b"CKA_PRIVATE",
+    b"CKA_MODIFIABLE",
+    b"CKA_LABEL",
+    b"CKA_ISSUER",
+    b"CKA_SERIAL_NUMBER",
+    b"CKA_CERTIFICATE_TYPE",
+    b"CKA_SUBJECT",
+    b"CKA_ID",
+    b"CKA_VALUE",
+    b"CKA_NSS_MOZILLA_CA_POLICY",
+    b"CKA_NSS_SERVER_DISTRUST_AFTER",
+    b"CKA_NSS_EMAIL_DISTRUST_AFTER",
+    b"CKA_CERT_SHA1_HASH",
+    b"CKA_CERT_MD5_HASH",
+    b"CKA_TRUST_SERVER_AUTH",
+    b"CKA_TRUST_EMAIL_PROTECTION",
+    b"CKA_TRUST_CODE_SIGNING",
+    b"CKA_TRUST_STEP_UP_APPROVED",
+]
+_ATTRIBUTE_IDS = {name: n for n, name in enumerate(_ATTRIBUTE_NAMES)}
+_CKA_CLASS_ID = _ATTRIBUTE_IDS[b"CKA_CLASS"]
+
+
+def _attribute_id(name: bytes) -> int:
+    attribute_id = _ATTRIBUTE_IDS.get(name)
+    if attribute_id is None:
+        attribute_id = _ATTRIBUTE_IDS[name] = len(_ATTRIBUTE_NAMES)
+        _ATTRIBUTE_NAMES.append(name)
+    return attribute_id
+
+
+_MISSING = object()
+
+
+class ParsedObject(Mapping[bytes, ParsedValue]):
+    """A parsed object: a read-only mapping from attribute name to value.
+
+    Values are stored in a tuple indexed by attribute ID, rather than in a
+    dict keyed by the full attribute name.
+    """
+
+    __slots__ = ("_values",)
+
+    def __init__(self, items: Mapping[bytes, ParsedValue] | None = None):
+        self._values = self._pack(
+            {_attribute_id(name): value for name, value in (items or {}).items()}
+        )
+
+    @staticmethod
+    def _pack(values_by_id: dict[int, ParsedValue]) -> tuple:
+        values = [_MISSING] * (max(values_by_id, default=-1) + 1)
+        for attribute_id, value in values_by_id.items():
+            values[attribute_id] = value
+        return tuple(values)
+
+    @classmethod
+    def _from_ids(cls, values_by_id: dict[int, ParsedValue]) -> "ParsedObject":
+        obj = cls.__new__(cls)
+        obj._values = cls._pack(values_by_id)
+        return obj
+
+    def __getitem__(self, name: bytes) -> ParsedValue:
+        value = self.get(name, _MISSING)
+        if value is _MISSING:
+            raise KeyError(name)
+        return value
+
+    def get(self, name, default=None):
+        attribute_id = _ATTRIBUTE_IDS.get(name)
+        if attribute_id is None or attribute_id >= len(self._values):
+            return default
+        value = self._values[attribute_id]
+        return default if value is _MISSING else value
+
+    def __contains__(self, name) -> bool:
+        return self.get(name, _MISSING) is not _MISSING
+
+    def __iter__(self) -> Iterator[bytes]:
+        for attribute_id, value in enumerate(self._values):
+            if value is not _MISSING:
+                yield _ATTRIBUTE_NAMES[attribute_id]
+
+    def __len__(self) -> int:
+        return len(self._values) - self._values.count(_MISSING)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
+
+    def __reduce__(self):
+        # Attribute IDs are only meaningful within this process.
+        return (type(self), (dict(self),))
+
+
+def _decode_multiline_octal(ck_value: bytes) -> bytes:
+    # Every byte is written as a three digit escape, \000 to \377. Once each
+    # group of four starts with a backslash and a digit no higher than 3, no
+    # escape "unicode-escape" sees can run past its group or decode above
+    # \377, so there's one code point per group only if every group is a
+    # \ooo escape.
+    escapes = len(ck_value) // 4
+    value = None
+    if ck_value[::4] == b"\\" * escapes and not ck_value[1::4].translate(None, b"0123"):
+        try:
+            value = ck_value.decode("unicode-escape")
+        except UnicodeDecodeError:
+            pass
+    if value is None or len(value) != escapes:
+        raise ParseError(f"malformed MULTILINE_OCTAL value {ck_value!r}")
+    return value.encode("latin1")
 
 
 def _value_to_python(ck_type: bytes, ck_value: bytes) -> ParsedValue:
@@ -50,31 +168,79 @@ def _value_to_python(ck_type: bytes, ck_value: bytes) -> ParsedValue:
             raise ParseError(f"CK_TRUST value {ck_value} doesn't begin with CKT_NSS_")
         return enums.TrustType[ck_value[len("CKT_NSS_") :].decode("utf-8")]
     elif ck_type == b"MULTILINE_OCTAL":
-        return ck_value.decode("unicode-escape").encode("latin1")
+        return _decode_multiline_octal(ck_value)
     else:
         raise ParseError(f"unknown type {ck_type} (value: {ck_value})")
 
 
+_TOKEN_RE = re.compile(
+    rb'((?P<space>\s+)|(?P<quoted_string>"(?:\\"|.)*?")|(?P<token>[^"\s][^\s]+))'
+)
+
+
+# Where objects start: the state machine begins a new object at every
+# CKA_CLASS attribute, and attribute names always start a line.
+_BEGINDATA_RE = re.compile(rb"^[ \t]*BEGINDATA\s*?$", re.MULTILINE)
+_OBJECT_START_RE = re.compile(rb"^[ \t]*CKA_CLASS\s", re.MULTILINE)
+
+
+def object_offsets(data: bytes) -> list[int]:
+    """Returns the offset of the start of each object's line in a certdata file.
+
+    The input can be cut at any of these offsets, and each piece after the
+    first parsed independently by a Parser(in_data=True).
+    """
+    m = _BEGINDATA_RE.search(data)
+    if not m:
+        return []
+    return [m.start() for m in _OBJECT_START_RE.finditer(data, m.end())]
+
+
 class Parser:
-    def __init__(self):
+    def __init__(
+        self,
+        in_data: bool = False,
+        classes: Collection[enums.ObjectType] | None = None,
+        attributes: Collection[bytes] | None = None,
+    ):
+        """Creates a parser.
+
+        If in_data is set, the input is assumed to start after BEGINDATA.
+
+        If classes is set, only objects with one of those CKA_CLASSes are
+        returned; if attributes is set, only those attributes (and CKA_CLASS)
+        are kept. Anything else is skipped over without being decoded.
+        """
         self.objects = []  # type: list[ParsedObject]
         self.state = ParserState.AWAITING_DATA
 
-        self._current_object = None  # type: ParsedObject | None
-        self._current_attribute = None  # type: bytes | None
+        self._classes = None if classes is None else frozenset(classes)
+        self._attributes = None if attributes is None else frozenset(attributes)
+        # Set once we've seen the CKA_CLASS of an object we don't want.
+        self._skip_object = False
+
+        # Values of the object being parsed, by attribute ID.
+        self._current_object = None  # type: dict[int, ParsedValue] | None
+        self._current_attribute = None  # type: int | None
         self._current_type = None  # type: bytes | None
-        self._current_value = None  # type: ParsedValue | None
+        # None if the current attribute is being skipped.
+        # For MULTILINE_OCTAL values, this is the list of lines making up the value.
+        self._current_value = None  # type: bytes | list[bytes] | None
+
+        # The start of a line that feed() hasn't seen the end of yet.
+        self._partial_line = []  # type: list[bytes]
+
+        if in_data:
+            self._current_object = {}
+            self.state = ParserState.OBJECT_AWAIT_ATTRIBUTE
 
     @staticmethod
-    def _split_line(ln: bytes) -> Iterable[bytes]:
+    def _split_line_regex(ln: bytes) -> Iterable[bytes]:
         # Consume either:
         # Whitespace
         # "quoted string with \" "
         # non-space token
-        for m in re.finditer(
-            rb'((?P<space>\s+)|(?P<quoted_string>"(?:\\"|.)*?")|(?P<token>[^"\s][^\s]+))',
-            ln,
-        ):
+        for m in _TOKEN_RE.finditer(ln):
             if m.group("space"):
                 continue
             elif m.group("quoted_string"):
@@ -82,57 +248,162 @@ class Parser:
             elif m.group("token"):
                 yield m.group("token")
 
-    def _new_object(self) -> Iterable[ParsedObject]:
-        if self._current_object:
-            yield self._current_object
+    @classmethod
+    def _split_line(cls, ln: bytes) -> list[bytes]:
+        # Nearly every line in certdata.txt is one of:
+        #   CKA_X CK_TYPE VALUE
+        #   CKA_X UTF8 "quoted value"
+        #   \ooo\ooo\ooo... (the body of a MULTILINE_OCTAL value)
+        #   END, BEGINDATA or CKA_X MULTILINE_OCTAL
+        # which can all be split without going through the regex. Anything
+        # else (escaped quotes, quotes elsewhere in the line, single-character
+        # tokens, which the regex drops) takes the general path.
+        quotes = ln.count(b'"')
+        if not quotes:
+            tokens = ln.split()
+            if 1 not in map(len, tokens):
+                return tokens
+        elif quotes == 2:
+            tokens = ln.split(None, 2)
+            if (
+                len(tokens) == 3
+                and len(tokens[2]) >= 2
+                and tokens[2][:1] == b'"'
+                and tokens[2][-1:] == b'"'
+                and 1 not in map(len, tokens[:2])
+            ):
+                tokens[2] = tokens[2][1:-1]
+                return tokens
+        return list(cls._split_line_regex(ln))
+
+    def _new_object(self) -> ParsedObject | None:
+        """Starts a new object, returning the previous one if it had anything in it."""
+        finished = None
+        if self._current_object and not self._skip_object:
+            finished = ParsedObject._from_ids(self._current_object)
+        self._skip_object = False
         self._current_object = {}
         self._new_attribute()
+        return finished
 
     def _new_attribute(self) -> None:
-        if self._current_attribute:
+        if self._current_attribute is not None:
+            value = self._current_value
+            if isinstance(value, list):
+                value = b"".join(value)
             # Parse the type to turn it into something useful.
-            self._current_object[self._current_attribute] = _value_to_python(
-                self._current_type, self._current_value
-            )
+            value = _value_to_python(self._current_type, value)
+            self._current_object[self._current_attribute] = value
+            if (
+                self._classes is not None
+                and self._current_attribute == _CKA_CLASS_ID
+                and value not in self._classes
+            ):
+                self._skip_object = True
         self._current_attribute = None
         self._current_type = None
         self._current_value = None
 
-    def parse_token(self, token: bytes) -> Iterable[ParsedObject]:
-        if self.state == ParserState.AWAITING_DATA:
-            if token == b"BEGINDATA":
-                yield from self._new_object()
-                self.state = ParserState.OBJECT_AWAIT_ATTRIBUTE
-        elif self.state == ParserState.OBJECT_AWAIT_ATTRIBUTE:
-            if token == b"CKA_CLASS":
-                yield from self._new_object()
-            self._current_attribute = token
-            self.state = ParserState.OBJECT_AWAIT_TYPE
-        elif self.state == ParserState.OBJECT_AWAIT_TYPE:
-            self._current_type = token
-            if token == b"MULTILINE_OCTAL":
-                self.state = ParserState.OBJECT_AWAIT_MULTILINE_OCTAL_VALUE
-            else:
-                self.state = ParserState.OBJECT_AWAIT_VALUE
-        elif self.state == ParserState.OBJECT_AWAIT_VALUE:
-            self._current_value = token
-            self._new_attribute()
-            self.state = ParserState.OBJECT_AWAIT_ATTRIBUTE
-        elif self.state == ParserState.OBJECT_AWAIT_MULTILINE_OCTAL_VALUE:
-            if token == b"END":
-                self._current_value = self._current_value
+    def _parse_tokens(self, tokens: Iterable[bytes]) -> list[ParsedObject]:
+        """Runs tokens through the state machine, returning any completed objects."""
+        completed = []
+        for token in tokens:
+            state = self.state
+            # Ordered by how often we see each state in certdata.txt.
+            if state is ParserState.OBJECT_AWAIT_MULTILINE_OCTAL_VALUE:
+                if token == b"END":
+                    self._new_attribute()
+                    self.state = ParserState.OBJECT_AWAIT_ATTRIBUTE
+                else:
+                    self._current_value.append(token)
+            elif state is ParserState.OBJECT_AWAIT_ATTRIBUTE:
+                if token == b"CKA_CLASS":
+                    finished = self._new_object()
+                    if finished:
+                        completed.append(finished)
+                    self._current_attribute = _CKA_CLASS_ID
+                elif self._skip_object or (
+                    self._attributes is not None and token not in self._attributes
+                ):
+                    self._current_attribute = None
+                else:
+                    self._current_attribute = _attribute_id(token)
+                self.state = ParserState.OBJECT_AWAIT_TYPE
+            elif state is ParserState.OBJECT_AWAIT_TYPE:
+                self._current_type = token
+                if token != b"MULTILINE_OCTAL":
+                    self.state = ParserState.OBJECT_AWAIT_VALUE
+                elif self._current_attribute is None:
+                    self.state = ParserState.OBJECT_SKIP_MULTILINE_OCTAL_VALUE
+                else:
+                    self._current_value = []
+                    self.state = ParserState.OBJECT_AWAIT_MULTILINE_OCTAL_VALUE
+            elif state is ParserState.OBJECT_AWAIT_VALUE:
+                self._current_value = token
                 self._new_attribute()
                 self.state = ParserState.OBJECT_AWAIT_ATTRIBUTE
-            elif not self._current_value:
-                self._current_value = token
-            else:
-                self._current_value += token
+            elif state is ParserState.OBJECT_SKIP_MULTILINE_OCTAL_VALUE:
+                # Don't even keep the lines of values we're skipping.
+                if token == b"END":
+                    self._new_attribute()
+                    self.state = ParserState.OBJECT_AWAIT_ATTRIBUTE
+            elif state is ParserState.AWAITING_DATA:
+                if token == b"BEGINDATA":
+                    finished = self._new_object()
+                    if finished:
+                        completed.append(finished)
+                    self.state = ParserState.OBJECT_AWAIT_ATTRIBUTE
+        return completed
+
+    def _parse_line(self, ln: bytes) -> list[ParsedObject]:
+        if (
+            self.state is ParserState.OBJECT_SKIP_MULTILINE_OCTAL_VALUE
+            and b"END" not in ln
+        ):
+            # Nothing on this line can end the value we're skipping, so there's
+            # no need to even tokenize it.
+            return []
+        ln = ln.strip()
+        if ln.startswith(b"#"):
+            return []
+        return self._parse_tokens(self._split_line(ln))
+
+    def parse_token(self, token: bytes) -> Iterable[ParsedObject]:
+        yield from self._parse_tokens((token,))
 
     def parse_lines(self, line_iterator: Iterable[bytes]) -> Iterable[ParsedObject]:
         for ln in line_iterator:
-            ln = ln.strip()
-            if ln.startswith(b"#"):
-                continue
-            for token in self._split_line(ln):
-                yield from self.parse_token(token)
-        yield from self._new_object()
+            completed = self._parse_line(ln)
+            if completed:
+                yield from completed
+        yield from self.close()
+
+    def feed(self, chunk: bytes) -> list[ParsedObject]:
+        """Parses the next chunk of input, returning any objects it completed.
+
+        Chunks can be split anywhere, including part-way through a line. An
+        object is only complete once the start of the next one has been seen,
+        so the last object is returned by close().
+        """
+        lines = chunk.split(b"\n")
+        if len(lines) == 1:
+            self._partial_line.append(chunk)
+            return []
+        if self._partial_line:
+            self._partial_line.append(lines[0])
+            lines[0] = b"".join(self._partial_line)
+        self._partial_line = [lines.pop()]
+
+        completed = []
+        for ln in lines:
+            completed.extend(self._parse_line(ln))
+        return completed
+
+    def close(self) -> list[ParsedObject]:
+        """Finishes parsing, returning any objects that were still incomplete."""
+        completed = self._parse_line(b"".join(self._partial_line))
+        self._partial_line = []
+        finished = self._new_object()
+        if finished:
+            completed.append(finished)
+        return completed
@@ -89,7 +89,7 @@ modifiable: false
 class: x-certificate-extension
 object-id: {str(oid)}
 value: {ce_bytes}
-{cert.public_key_pem().encode()}
+{cert.public_key_pem_text()}
 """
         )
 
@@ -102,7 +102,7 @@ label: {_quote(trust.label)}
 modifiable: false
 {self._trust_attributes(trust)}\
 {self._cert_attributes(cert)}\
-{cert.as_pem().encode()}
+{cert.as_pem_text()}
 """
         )
         trusted_to_delegate_for = trust.trusted_key_usages
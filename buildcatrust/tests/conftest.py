@@ -0,0 +1,12 @@
+# SPDX-FileCopyrightText: 2021 the buildcatrust authors
+#
+# SPDX-License-Identifier: MIT
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _isolated_cache_dir(tmp_path_factory, monkeypatch):
+    # Keep the ingest cache out of the real home directory, and stop tests from
+    # seeing each other's cached records.
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path_factory.mktemp("cache")))
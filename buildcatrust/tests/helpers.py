@@ -2,13 +2,43 @@
 #
 # SPDX-License-Identifier: MIT
 
+from collections.abc import Iterable
+import hashlib
 import pathlib
 
 from buildcatrust import cli
+from buildcatrust import enums
+from buildcatrust import nss_parser
 
 TESTDATA_DIR = pathlib.Path(__file__).parent / "testdata"
 
 
+def certificate_hashes(lines: Iterable[bytes]) -> list[tuple[bytes, bytes]]:
+    """Pairs the SHA-1 of each certificate in certdata with its trust's CKA_CERT_SHA1_HASH."""
+    objs = list(nss_parser.Parser().parse_lines(lines))
+    trust_hashes = {
+        (obj[b"CKA_ISSUER"], obj[b"CKA_SERIAL_NUMBER"]): obj[b"CKA_CERT_SHA1_HASH"]
+        for obj in objs
+        if obj[b"CKA_CLASS"] == enums.ObjectType.NSS_TRUST
+    }
+    return [
+        (
+            hashlib.sha1(obj[b"CKA_VALUE"]).digest(),
+            trust_hashes[obj[b"CKA_ISSUER"], obj[b"CKA_SERIAL_NUMBER"]],
+        )
+        for obj in objs
+        if obj[b"CKA_CLASS"] == enums.ObjectType.CERTIFICATE
+    ]
+
+
+def repeated_certdata(copies: int) -> bytes:
+    """Returns the test certdata with its objects repeated copies times."""
+    with open(TESTDATA_DIR / "certdata-certumec384.txt", "rb") as f:
+        data = f.read()
+    begin_objects = nss_parser.object_offsets(data)[0]
+    return data[:begin_objects] + data[begin_objects:] * copies
+
+
 def run_main(**kwargs):
     args = [f"--{k}={v}" for k, v in kwargs.items()]
     return cli.cli_main(args)
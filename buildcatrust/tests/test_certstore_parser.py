@@ -5,9 +5,13 @@
 import io
 
 from buildcatrust import certstore_parser
+from buildcatrust import der_x509
 from buildcatrust import enums
+from buildcatrust import nss_parser
 from buildcatrust import types
 
+from . import helpers
+
 CERTUM_NAME = "cn=Certum_EC-384_CA:6b328085:788f275c81125220a504d02dddba73f4"
 
 
@@ -47,6 +51,38 @@ nvuRlydd3LBbMHHOXjgaatkl5+r3YZJW+OraNsKHZZYuciUvf9/DE8k=
     assert trust.trust_ipsec_user == enums.TrustType.UNKNOWN
 
 
+def test_read_certificates_decodes_once(monkeypatch):
+    fp = io.StringIO(
+        """\
+-----BEGIN TRUSTED CERTIFICATE-----
+MIICZTCCAeugAwIBAgIQeI8nXIESUiClBNAt3bpz9DAKBggqhkjOPQQDAzB0MQsw
+CQYDVQQGEwJQTDEhMB8GA1UEChMYQXNzZWNvIERhdGEgU3lzdGVtcyBTLkEuMScw
+JQYDVQQLEx5DZXJ0dW0gQ2VydGlmaWNhdGlvbiBBdXRob3JpdHkxGTAXBgNVBAMT
+EENlcnR1bSBFQy0zODQgQ0EwHhcNMTgwMzI2MDcyNDU0WhcNNDMwMzI2MDcyNDU0
+WjB0MQswCQYDVQQGEwJQTDEhMB8GA1UEChMYQXNzZWNvIERhdGEgU3lzdGVtcyBT
+LkEuMScwJQYDVQQLEx5DZXJ0dW0gQ2VydGlmaWNhdGlvbiBBdXRob3JpdHkxGTAX
+BgNVBAMTEENlcnR1bSBFQy0zODQgQ0EwdjAQBgcqhkjOPQIBBgUrgQQAIgNiAATE
+KI6rGFtqvm5kN2PkzeyrOvfMobgOgknXhimfoZTy42B4mIF4Bk3y7JoOV2CDn7Tm
+Fy8as10CW4kjPMIRBSqniBMY81CE1700LCeJVf/OTOffph8oxPBUw7l8t1Ot68Kj
+QjBAMA8GA1UdEwEB/wQFMAMBAf8wHQYDVR0OBBYEFI0GZnQkdjrzife81r1HfS+8
+EF9LMA4GA1UdDwEB/wQEAwIBBjAKBggqhkjOPQQDAwNoADBlAjADVS2m5hjEfO/J
+UG7BJw+ch69u1RsIGL2SKcHvlJF40jocVYli5RsJHrpka/F2tNQCMQC0QoSZ/6vn
+nvuRlydd3LBbMHHOXjgaatkl5+r3YZJW+OraNsKHZZYuciUvf9/DE8kwGDAKBggr
+BgEFBQcDAaAKBggrBgEFBQcDBw==
+-----END TRUSTED CERTIFICATE-----
+"""
+    )
+    ((cert, _),) = certstore_parser.read_certificates(fp)
+
+    def no_decoding(*args, **kwargs):
+        raise AssertionError("certificate decoded more than once")
+
+    monkeypatch.setattr(der_x509.Certificate, "_from_der_at", no_decoding)
+
+    assert cert.as_x509().der == cert.value
+    assert cert.public_key_pem().name == "PUBLIC KEY"
+
+
 def test_read_certificates_openssl_trusted():
     certum_pem = """\
 more garbage
@@ -82,3 +118,28 @@ BgEFBQcDAaAKBggrBgEFBQcDBw==
     assert trust.trust_server_auth == enums.TrustType.TRUSTED_DELEGATOR
     assert trust.trust_client_auth == enums.TrustType.UNKNOWN
     assert trust.trust_ipsec_user == enums.TrustType.NOT_TRUSTED
+
+
+def test_read_certificates_from_path(tmp_path):
+    with open(helpers.TESTDATA_DIR / "certdata-certumec384.txt", "rb") as f:
+        objs = list(nss_parser.Parser().parse_lines(f))
+    pem = der_x509.PEMBlock(name="CERTIFICATE", content=objs[1][b"CKA_VALUE"])
+
+    bundle_path = tmp_path / "bundle.crt"
+    bundle_path.write_bytes(
+        b"leading garbage\r\n"
+        + pem.encode().replace("\n", "\r\n").encode("ascii")
+        + b"-----BEGIN UNRELATED-----\nAAAA\n-----END UNRELATED-----\n"
+        + pem.encode().encode("ascii")
+        + b"-----BEGIN CERTIFICATE-----\nunterminated\n"
+    )
+    certs = certstore_parser.read_certificates_from_path(bundle_path)
+    assert len(certs) == 2
+    for cert, trust in certs:
+        assert cert.value == pem.content
+        assert cert.clean_filename == CERTUM_NAME
+        assert trust.trust_server_auth == enums.TrustType.TRUSTED_DELEGATOR
+
+    empty_path = tmp_path / "empty.crt"
+    empty_path.write_bytes(b"")
+    assert certstore_parser.read_certificates_from_path(empty_path) == []
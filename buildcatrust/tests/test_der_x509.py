@@ -3,8 +3,38 @@
 # SPDX-License-Identifier: MIT
 
 import dataclasses
+import pickle
+
+import pytest
 
 from buildcatrust import der_x509
+from buildcatrust import x509_consts
+
+CERTUM_EC384_DER = bytes.fromhex(
+    """\
+30820265308201eba0030201020210788f275c81125220a504d02dddba73
+f4300a06082a8648ce3d0403033074310b300906035504061302504c3121
+301f060355040a131841737365636f20446174612053797374656d732053
+2e412e31273025060355040b131e43657274756d20436572746966696361
+74696f6e20417574686f7269747931193017060355040313104365727475
+6d2045432d333834204341301e170d3138303332363037323435345a170d
+3433303332363037323435345a3074310b300906035504061302504c3121
+301f060355040a131841737365636f20446174612053797374656d732053
+2e412e31273025060355040b131e43657274756d20436572746966696361
+74696f6e20417574686f7269747931193017060355040313104365727475
+6d2045432d3338342043413076301006072a8648ce3d020106052b810400
+2203620004c4288eab185b6abe6e643763e4cdecab3af7cca1b80e8249d7
+86299fa194f2e36078988178064df2ec9a0e5760839fb4e6172f1ab35d02
+5b89233cc211052aa7881318f35084d7bd342c278955ffce4ce7dfa61f28
+c4f054c3b97cb753adebc2a3423040300f0603551d130101ff0405300301
+01ff301d0603551d0e041604148d06667424763af389f7bcd6bd477d2fbc
+105f4b300e0603551d0f0101ff040403020106300a06082a8648ce3d0403
+030368003065023003552da6e618c47cefc9506ec1270f9c87af6ed51b08
+18bd9229c1ef949178d23a1c558962e51b091eba646bf176b4d4023100b4
+428499ffabe79efb9197275ddcb05b3071ce5e381a6ad925e7eaf7619256
+f8eada36c28765962e72252f7fdfc313c9
+"""
+)
 
 
 def test_object_id():
@@ -22,6 +52,44 @@ def test_object_id():
     )
 
 
+def test_object_id_hashable():
+    c = der_x509.ObjectID(name="Hello", oid=[1, 2, 3, 4, 2554])
+    assert c.oid == (1, 2, 3, 4, 2554)
+    assert c.as_der() is c.as_der()
+    d, _ = der_x509.ObjectID.from_der(c.as_der())
+    assert hash(c) == hash(d)
+    assert d in {c}
+    assert {c: 1}[d] == 1
+
+
+def test_object_id_known():
+    server_auth = x509_consts.PURPOSES[0].object_id
+    decoded, _ = der_x509.ObjectID.from_der(server_auth.as_der())
+    assert decoded is server_auth
+    assert decoded.name == "RFC5280: serverAuth key usage"
+
+
+def test_object_id_large_first_arc():
+    c = der_x509.ObjectID.from_str("Hello", "2.999.3")
+    assert c.as_der() == b"\x06\x03\x88\x37\x03"
+    assert der_x509.ObjectID.from_der(c.as_der()) == (c, b"")
+
+
+def test_object_id_malformed():
+    # Length runs past the end of the buffer.
+    with pytest.raises(der_x509.ParseError):
+        der_x509.ObjectID.from_der(b"\x06\x05\x2a\x03")
+    # Final subidentifier has its continuation bit set.
+    with pytest.raises(der_x509.ParseError):
+        der_x509.ObjectID.from_der(b"\x06\x02\x2a\x83")
+    # Indefinite lengths aren't valid DER.
+    with pytest.raises(der_x509.ParseError):
+        der_x509.ObjectID.from_der(b"\x06\x80\x2a\x00\x00")
+    # Long-form length with its length bytes missing.
+    with pytest.raises(der_x509.ParseError):
+        der_x509.ObjectID.from_der(b"\x06\x84\x01")
+
+
 def test_encode_long_length():
     c = der_x509.ObjectID(name="", oid=list(range(0x100)))
     assert c.as_der()[:4] == b"\x06\x82\x01\x7f"
@@ -121,6 +189,40 @@ helloworld8=
     assert der_x509.PEMBlock.decode(pem.encode()) == ("", pem, "")
 
 
+def test_pemblock_decode_all():
+    buf = b"""\
+garbage
+-----BEGIN TEST BLOCK-----\r
+hell\r
+owor\r
+ld8=\r
+-----END TEST BLOCK-----\r
+-----BEGIN OTHER BLOCK-----
+X-Hdr: a
+
+helloworld8=
+-----END OTHER BLOCK-----
+-----BEGIN EMPTY-----
+-----END EMPTY-----
+-----BEGIN UNTERMINATED-----
+helloworld8=
+"""
+    blocks = list(der_x509.PEMBlock.decode_all(buf))
+    assert [b.name for b in blocks] == ["TEST BLOCK", "OTHER BLOCK", "EMPTY"]
+    assert blocks[0].content == bytes.fromhex("85e965a30a2b95df")
+    assert blocks[1].content == bytes.fromhex("85e965a30a2b95df")
+    assert blocks[2].content == b""
+
+
+def test_pemblock_decode_all_unterminated():
+    block = b"-----BEGIN A-----\nhelloworld8=\n-----END A-----\n"
+    buf = b"-----BEGIN B-----\nabcd\n" * 1000 + block + b"-----BEGIN C-----\n"
+    blocks = list(der_x509.PEMBlock.decode_all(buf))
+    assert [(b.name, b.content) for b in blocks] == [
+        ("A", bytes.fromhex("85e965a30a2b95df"))
+    ]
+
+
 def test_encode_decode_int():
     i = 10
     assert der_x509._decode_int(der_x509._encode_int(i)) == (i, bytearray())
@@ -130,31 +232,7 @@ def test_encode_decode_int():
 
 
 def test_parse_openssl_cert():
-    cert_bytes = bytes.fromhex(
-        """\
-30820265308201eba0030201020210788f275c81125220a504d02dddba73
-f4300a06082a8648ce3d0403033074310b300906035504061302504c3121
-301f060355040a131841737365636f20446174612053797374656d732053
-2e412e31273025060355040b131e43657274756d20436572746966696361
-74696f6e20417574686f7269747931193017060355040313104365727475
-6d2045432d333834204341301e170d3138303332363037323435345a170d
-3433303332363037323435345a3074310b300906035504061302504c3121
-301f060355040a131841737365636f20446174612053797374656d732053
-2e412e31273025060355040b131e43657274756d20436572746966696361
-74696f6e20417574686f7269747931193017060355040313104365727475
-6d2045432d3338342043413076301006072a8648ce3d020106052b810400
-2203620004c4288eab185b6abe6e643763e4cdecab3af7cca1b80e8249d7
-86299fa194f2e36078988178064df2ec9a0e5760839fb4e6172f1ab35d02
-5b89233cc211052aa7881318f35084d7bd342c278955ffce4ce7dfa61f28
-c4f054c3b97cb753adebc2a3423040300f0603551d130101ff0405300301
-01ff301d0603551d0e041604148d06667424763af389f7bcd6bd477d2fbc
-105f4b300e0603551d0f0101ff040403020106300a06082a8648ce3d0403
-030368003065023003552da6e618c47cefc9506ec1270f9c87af6ed51b08
-18bd9229c1ef949178d23a1c558962e51b091eba646bf176b4d4023100b4
-428499ffabe79efb9197275ddcb05b3071ce5e381a6ad925e7eaf7619256
-f8eada36c28765962e72252f7fdfc313c9
-"""
-    )
+    cert_bytes = CERTUM_EC384_DER
     cert_aux = der_x509.OpenSSLCertAux(
         trust=[der_x509.ObjectID.from_str(None, "1.2.3.4")],
         reject=[der_x509.ObjectID.from_str(None, "1.2.3.9")],
@@ -168,6 +246,9 @@ f8eada36c28765962e72252f7fdfc313c9
     assert got_cert_aux == cert_aux
     assert trailing == b""
 
+    with pytest.raises(der_x509.ParseError):
+        der_x509.Certificate.from_der(cert_bytes[:-1])
+
 
 def test_distinguished_name():
     test_dn = bytes.fromhex(
@@ -191,3 +272,40 @@ def test_distinguished_name_multiple():
         str(dn)
         == "c=SI,o=state authorities,ou=servers,{l=Ljubljana,cn=vpn.gov.si,jurisdictionOfIncorporationCountryName=SI,serialNumber=1237719713010,businessCategory=Government Entity}"
     )
+
+
+def test_distinguished_name_interned():
+    cert, _ = der_x509.Certificate.from_der(CERTUM_EC384_DER)
+    subject, rem = der_x509.DistinguishedName.from_der(cert.tbs_certificate.subject)
+    assert not rem
+    issuer, _ = der_x509.DistinguishedName.from_der(cert.tbs_certificate.issuer)
+    # Self-signed, so both decode to the very same object.
+    assert issuer is subject
+    assert pickle.loads(pickle.dumps(subject)) is subject
+    assert subject.bits[0][0][0] is issuer.bits[0][0][0]
+    assert not hasattr(subject, "__dict__")
+
+
+def test_tbs_certificate_fields():
+    cert, trailing = der_x509.Certificate.from_der(CERTUM_EC384_DER)
+    assert trailing == b""
+    tbs = cert.tbs_certificate
+
+    # The view refers into the certificate rather than copying it.
+    assert tbs.buf is CERTUM_EC384_DER
+
+    assert tbs.version == b"\xa0\x03\x02\x01\x02"
+    assert der_x509.der_int_to_python(tbs.serial_number)[0] == (
+        0x788F275C81125220A504D02DDDBA73F4
+    )
+    assert tbs.issuer == tbs.subject
+    assert str(der_x509.DistinguishedName.from_der(tbs.subject)[0]) == (
+        "c=PL,o=Asseco Data Systems S.A.,ou=Certum Certification Authority,cn=Certum EC-384 CA"
+    )
+    assert tbs.validity == bytes.fromhex(
+        "301e170d3138303332363037323435345a170d3433303332363037323435345a"
+    )
+    assert tbs.subject_public_key_info[:2] == b"\x30\x76"
+    assert tbs.issuer_unique_id is None
+    assert tbs.subject_unique_id is None
+    assert tbs.extensions[:2] == b"\xa3\x42"
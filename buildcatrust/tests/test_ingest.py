@@ -0,0 +1,67 @@
+# SPDX-FileCopyrightText: 2021 the buildcatrust authors
+#
+# SPDX-License-Identifier: MIT
+
+from buildcatrust import ingest
+from buildcatrust import types
+
+from . import helpers
+
+
+def _conflicting_inputs(tmp_path):
+    """Writes inputs that describe the same certificate with different trust."""
+    certdata = helpers.TESTDATA_DIR / "certdata-certumec384.txt"
+    distrusted = tmp_path / "distrusted.txt"
+    distrusted.write_bytes(
+        certdata.read_bytes().replace(
+            b"CKT_NSS_TRUSTED_DELEGATOR", b"CKT_NSS_NOT_TRUSTED"
+        )
+    )
+    bundles = []
+    for path in (certdata, distrusted):
+        bundle = tmp_path / f"{path.stem}.crt"
+        assert helpers.run_main(certdata_input=path, ca_bundle_output=bundle) == 0
+        bundles.append(bundle)
+    return [
+        ("certdata", certdata),
+        ("ca_bundle", bundles[0]),
+        ("certdata", distrusted),
+        ("ca_bundle", bundles[1]),
+    ]
+
+
+def _merged_trust(results):
+    db = types.CertDB()
+    for records in results:
+        db.add_records(records)
+    return db.trustmap
+
+
+def test_load_all_preserves_order(tmp_path):
+    inputs = _conflicting_inputs(tmp_path)
+    loaders = {"certdata": ingest.load_certdata, "ca_bundle": ingest.load_ca_bundle}
+    want = [loaders[kind](path) for kind, path in inputs]
+    # Later inputs override earlier ones, so the order matters.
+    assert _merged_trust(want) != _merged_trust(reversed(want))
+
+    assert list(ingest.load_all(inputs)) == want
+    assert list(ingest.load_all(inputs, jobs=2)) == want
+
+
+def test_certdata_shards(monkeypatch):
+    data = helpers.repeated_certdata(20)
+    monkeypatch.setattr(ingest, "MIN_OBJECTS_PER_SHARD", 4)
+    assert len(ingest.certdata_shards(data, 8)) == 8
+    shards = ingest.certdata_shards(data, 100)
+    assert len(shards) == 15
+    assert b"".join(shards) == data
+
+
+def test_load_all_shards_certdata(tmp_path, monkeypatch):
+    path = tmp_path / "certdata.txt"
+    path.write_bytes(helpers.repeated_certdata(20))
+    (serial,) = ingest.load_all([("certdata", path)])
+    assert len(serial) == 40
+
+    monkeypatch.setattr(ingest, "MIN_OBJECTS_PER_SHARD", 4)
+    assert list(ingest.load_all([("certdata", path)], jobs=4)) == [serial]
@@ -0,0 +1,151 @@
+# SPDX-FileCopyrightText: 2021 the buildcatrust authors
+#
+# SPDX-License-Identifier: MIT
+
+import marshal
+import os
+import pickle
+
+import pytest
+
+from buildcatrust import der_x509
+from buildcatrust import ingest
+from buildcatrust import ingest_cache
+from buildcatrust import types
+
+from . import helpers
+
+
+def test_key_depends_on_kind_and_content():
+    key = ingest_cache.IngestCache.key
+    assert key("certdata", b"a") == key("certdata", b"a")
+    assert key("certdata", b"a") != key("certdata", b"b")
+    assert key("certdata", b"a") != key("ca_bundle", b"a")
+
+
+def _records():
+    certdata = helpers.TESTDATA_DIR / "certdata-certumec384.txt"
+    cert, trust = ingest.load_certdata(certdata)
+    return [cert, trust, trust.as_distrusted()]
+
+
+def test_get_put(tmp_path):
+    cache = ingest_cache.IngestCache(str(tmp_path / "cache"))
+    assert cache.get("missing") is None
+    records = _records()
+    cache.put("k", records)
+    got = cache.get("k")
+    assert got == records
+    assert [t.trust_state for t in got[1:]] == [t.trust_state for t in records[1:]]
+
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    cache = ingest_cache.IngestCache(str(tmp_path))
+    (tmp_path / "k.marshal").write_bytes(b"not marshal")
+    assert cache.get("k") is None
+    assert not (tmp_path / "k.marshal").exists()
+
+
+class _Payload:
+    def __init__(self, path):
+        self.path = path
+
+    def __reduce__(self):
+        return (open, (self.path, "w"))
+
+
+@pytest.mark.parametrize(
+    "make_entry",
+    [
+        lambda marker: pickle.dumps(_Payload(marker)),
+        lambda marker: marshal.dumps({("trust",): 1}),
+        lambda marker: marshal.dumps([("certificate", "too short")]),
+        lambda marker: marshal.dumps(
+            [("trust", "x", b"", b"", False, (("label", 1),))]
+        ),
+        lambda marker: marshal.dumps([("trust", "x", b"0\x00\x00", b"", False, ())]),
+        lambda marker: marshal.dumps([compile(f"open({marker!r}, 'w')", "", "exec")]),
+    ],
+)
+def test_tampered_entry_is_a_miss(tmp_path, make_entry):
+    marker = str(tmp_path / "ran")
+    cache = ingest_cache.IngestCache(str(tmp_path / "cache"))
+    cache.put("k", _records())
+    (tmp_path / "cache" / "k.marshal").write_bytes(make_entry(marker))
+    assert cache.get("k") is None
+    assert not os.path.exists(marker)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ingest_cache.IngestCache(str(tmp_path), max_bytes=1 << 30)
+    for n, name in enumerate(["a", "b", "c"]):
+        cache.put(name, _records())
+        os.utime(tmp_path / f"{name}.marshal", ns=(n * 10**9, n * 10**9))
+    # Reading "a" makes it the most recently used.
+    assert cache.get("a") is not None
+
+    entry_size = (tmp_path / "a.marshal").stat().st_size
+    cache.max_bytes = entry_size * 2
+    cache.put("d", _records())
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.marshal", "d.marshal"]
+
+
+def test_unwritable_cache_dir(tmp_path):
+    not_a_dir = tmp_path / "file"
+    not_a_dir.write_bytes(b"")
+    cache = ingest_cache.IngestCache(str(not_a_dir / "cache"))
+    cache.put("k", _records())
+    assert cache.get("k") is None
+
+
+def test_unstorable_value(tmp_path):
+    cache = ingest_cache.IngestCache(str(tmp_path))
+    cache.put("k", [object()])
+    assert cache.get("k") is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_load_certdata_cached(tmp_path, monkeypatch):
+    cache = ingest_cache.IngestCache(str(tmp_path))
+    path = helpers.TESTDATA_DIR / "certdata-certumec384.txt"
+    cold = ingest.load_certdata(path, cache)
+    assert [type(r) for r in cold] == [types.Certificate, types.Trust]
+
+    def fail(data):
+        raise AssertionError("cache hit should not reparse")
+
+    monkeypatch.setattr(ingest, "parse_certdata", fail)
+    assert ingest.load_certdata(path, cache) == cold
+
+
+def test_load_ca_bundle_cached(tmp_path, monkeypatch):
+    (cert, _) = ingest.load_certdata(helpers.TESTDATA_DIR / "certdata-certumec384.txt")
+    path = tmp_path / "bundle.crt"
+    path.write_text(der_x509.PEMBlock(name="CERTIFICATE", content=cert.value).encode())
+
+    cache = ingest_cache.IngestCache(str(tmp_path / "cache"))
+    cold = ingest.load_ca_bundle(path, cache)
+    assert [type(r) for r in cold] == [types.Certificate, types.Trust]
+    assert ingest.load_ca_bundle(path) == cold
+
+    def fail(buf):
+        raise AssertionError("cache hit should not reparse")
+
+    monkeypatch.setattr(ingest, "parse_ca_bundle", fail)
+    assert ingest.load_ca_bundle(path, cache) == cold
+
+
+def test_sharded_certdata_cached(tmp_path, monkeypatch):
+    path = tmp_path / "certdata.txt"
+    path.write_bytes(helpers.repeated_certdata(20))
+    monkeypatch.setattr(ingest, "MIN_OBJECTS_PER_SHARD", 4)
+
+    cache = ingest_cache.IngestCache(str(tmp_path / "cache"))
+    (sharded,) = ingest.load_all([("certdata", path)], cache, jobs=4)
+
+    def fail(data):
+        raise AssertionError("cache hit should not reparse")
+
+    # The sharded parse is cached under the same key as a serial one.
+    monkeypatch.setattr(ingest, "parse_certdata", fail)
+    assert ingest.load_certdata(path, cache) == sharded
@@ -2,6 +2,20 @@
 #
 # SPDX-License-Identifier: MIT
 
+import dataclasses
+import io
+import os
+import pickle
+
+import pytest
+
+from buildcatrust import certstore_output
+from buildcatrust import cli
+from buildcatrust import ingest
+from buildcatrust import ingest_cache
+from buildcatrust import nss_parser
+from buildcatrust import p11kit_output
+from buildcatrust import types
 
 from . import helpers
 
@@ -185,3 +199,528 @@ CAYIKwYBBQUHAwUGCCsGAQUFBwMGBggrBgEFBQcDBw==
             "blocklist_input": helpers.TESTDATA_DIR / "blocklist-certumec384.txt",
         },
     )
+
+
+def test_warm_cache_skips_parsing(tmp_path, monkeypatch):
+    certdata = helpers.TESTDATA_DIR / "certdata-certumec384.txt"
+    cache_dir = tmp_path / "cache"
+    cold_output = tmp_path / "cold.crt"
+    assert (
+        helpers.run_main(
+            certdata_input=certdata, cache_dir=cache_dir, ca_bundle_output=cold_output
+        )
+        == 0
+    )
+    assert list(cache_dir.iterdir())
+
+    def fail(data):
+        raise AssertionError("warm run should not reparse")
+
+    monkeypatch.setattr(ingest, "parse_certdata", fail)
+    warm_output = tmp_path / "warm.crt"
+    assert (
+        helpers.run_main(
+            certdata_input=certdata, cache_dir=cache_dir, ca_bundle_output=warm_output
+        )
+        == 0
+    )
+    assert warm_output.read_bytes() == cold_output.read_bytes()
+
+
+def test_cache_is_opt_in(tmp_path):
+    certdata = helpers.TESTDATA_DIR / "certdata-certumec384.txt"
+    assert (
+        helpers.run_main(certdata_input=certdata, ca_bundle_output=tmp_path / "a.crt")
+        == 0
+    )
+    assert not os.path.exists(ingest_cache.default_cache_dir())
+
+    args = [
+        f"--certdata_input={certdata}",
+        f"--ca_bundle_output={tmp_path / 'b.crt'}",
+        "--cache",
+    ]
+    assert cli.cli_main(args) == 0
+    assert os.listdir(ingest_cache.default_cache_dir())
+
+
+def test_tampered_cache_entry(tmp_path):
+    certdata = helpers.TESTDATA_DIR / "certdata-certumec384.txt"
+    want = tmp_path / "want.p11"
+    assert helpers.run_main(certdata_input=certdata, p11kit_output=want) == 0
+
+    # An entry that distrusts everything, where a cached parse would be.
+    cert, trust = ingest.load_certdata(certdata)
+    key = ingest_cache.IngestCache.key("certdata", certdata.read_bytes())
+    cache_dir = ingest_cache.default_cache_dir()
+    ingest_cache.IngestCache(cache_dir).put(key, [cert, trust.as_distrusted()])
+    got = tmp_path / "got.p11"
+    assert helpers.run_main(certdata_input=certdata, p11kit_output=got) == 0
+    assert got.read_bytes() == want.read_bytes()
+
+    # With the cache on, an entry that isn't plain data is never run.
+    marker = tmp_path / "ran"
+    entry = os.path.join(cache_dir, f"{key}.marshal")
+    with open(entry, "wb") as f:
+        f.write(pickle.dumps(_OpenOnLoad(str(marker))))
+    assert (
+        cli.cli_main(
+            [f"--certdata_input={certdata}", f"--p11kit_output={got}", "--cache"]
+        )
+        == 0
+    )
+    assert got.read_bytes() == want.read_bytes()
+    assert not marker.exists()
+
+
+class _OpenOnLoad:
+    def __init__(self, path):
+        self.path = path
+
+    def __reduce__(self):
+        return (open, (self.path, "w"))
+
+
+def test_jobs_matches_serial(tmp_path):
+    certdata = helpers.TESTDATA_DIR / "certdata-certumec384.txt"
+    bundle_dir = tmp_path / "bundles"
+    bundle_dir.mkdir()
+    # Several files that all describe the same certificate, so the result
+    # depends on the order they're merged in.
+    assert (
+        helpers.run_main(
+            certdata_input=certdata,
+            ca_standard_bundle_output=bundle_dir / "a.crt",
+            ca_bundle_output=bundle_dir / "c.crt",
+        )
+        == 0
+    )
+    assert (
+        helpers.run_main(
+            certdata_input=certdata,
+            blocklist_input=helpers.TESTDATA_DIR / "blocklist-certumec384.txt",
+            ca_bundle_output=bundle_dir / "b.crt",
+        )
+        == 0
+    )
+
+    outputs = []
+    for jobs in (1, 3):
+        output = tmp_path / f"jobs{jobs}.p11"
+        assert (
+            cli.cli_main(
+                [
+                    f"--certdata_input={certdata}",
+                    f"--ca_bundle_input={bundle_dir}",
+                    f"--p11kit_output={output}",
+                    f"--jobs={jobs}",
+                ]
+            )
+            == 0
+        )
+        outputs.append(output.read_bytes())
+    assert outputs[0] == outputs[1]
+    assert b"x-distrusted: true" not in outputs[0]
+
+
+def test_blocklist_by_fingerprint(tmp_path):
+    certdata = helpers.TESTDATA_DIR / "certdata-certumec384.txt"
+    by_label = tmp_path / "by_label.p11"
+    assert (
+        helpers.run_main(
+            certdata_input=certdata,
+            blocklist_input=helpers.TESTDATA_DIR / "blocklist-certumec384.txt",
+            p11kit_output=by_label,
+        )
+        == 0
+    )
+
+    sha256 = "6b328085625318aa50d173c98d8bda09d57e27413d114cf787a0f5d06c030cf6"
+    for entry in [
+        f"sha256:{sha256}",
+        "sha256:" + ":".join(sha256[i : i + 2] for i in range(0, 64, 2)).upper(),
+        "sha1:f33e783cacdff4a2ccac67556956d7e5163ce1ed",
+        "spki-sha256:de7b6932e9c44582ce0de07abdab7eea90c75d6d2a07331df57bd5cb88553d13",
+        "subject-hash:9482e63a",
+    ]:
+        blocklist = tmp_path / "blocklist.txt"
+        blocklist.write_text(f"# {entry}\n{entry}\n")
+        output = tmp_path / "by_fingerprint.p11"
+        assert (
+            helpers.run_main(
+                certdata_input=certdata,
+                blocklist_input=blocklist,
+                p11kit_output=output,
+            )
+            == 0
+        ), entry
+        assert output.read_text() == by_label.read_text()
+
+    blocklist.write_text("sha256:" + "0" * 64 + "\n")
+    assert (
+        helpers.run_main(
+            certdata_input=certdata, blocklist_input=blocklist, p11kit_output=output
+        )
+        == 3
+    )
+
+
+def test_resolve_blocklist_entry_cross_signed():
+    db = types.CertDB()
+    with open(helpers.TESTDATA_DIR / "certdata-certumec384.txt", "rb") as f:
+        db.add_nss_objs(nss_parser.Parser().parse_lines(f))
+    (cert,) = db.certmap.values()
+    (trust,) = db.trustmap.values()
+    # The same key, under a different name: both should be matched.
+    db.add_records(
+        [
+            dataclasses.replace(cert, label="Cross-signed"),
+            dataclasses.replace(trust, label="Cross-signed"),
+        ]
+    )
+    spki = f"spki-sha256:{cert.spki_sha256_fingerprint}"
+    assert cli.resolve_blocklist_entry(db, spki) == set(db.trustmap)
+    assert cli.resolve_blocklist_entry(db, "Cross-signed") == {
+        "Cross-signed:788f275c81125220a504d02dddba73f4"
+    }
+    assert cli.resolve_blocklist_entry(db, "sha1:00") == set()
+
+
+def test_dedupe_policy(tmp_path, capsys):
+    certdata = helpers.TESTDATA_DIR / "certdata-certumec384.txt"
+    # A plain PEM bundle doesn't carry the NSS label, so the certificate comes
+    # back under a different key.
+    bundle = tmp_path / "standard.crt"
+    assert (
+        helpers.run_main(certdata_input=certdata, ca_standard_bundle_output=bundle) == 0
+    )
+
+    single = tmp_path / "single.p11"
+    assert helpers.run_main(certdata_input=certdata, p11kit_output=single) == 0
+
+    for policy, copies in [("off", 2), ("first_wins", 1), ("most_restrictive", 1)]:
+        output = tmp_path / f"{policy}.p11"
+        capsys.readouterr()
+        assert (
+            helpers.run_main(
+                certdata_input=certdata,
+                ca_bundle_input=bundle,
+                p11kit_output=output,
+                dedupe_policy=policy,
+            )
+            == 0
+        )
+        assert output.read_text().count("BEGIN CERTIFICATE") == copies, policy
+        if policy == "first_wins":
+            assert output.read_text() == single.read_text()
+        elif policy == "most_restrictive":
+            # The plain PEM copy says nothing about email, which wins over the
+            # certdata's TRUSTED_DELEGATOR.
+            assert "emailProtection" not in output.read_text()
+        if copies == 1:
+            assert "Merged duplicate certs into Certum_EC-384_CA:" in (
+                capsys.readouterr().err
+            )
+
+
+@pytest.mark.parametrize("policy", ["off", "first_wins", "most_restrictive"])
+def test_dedupe_policy_blocklist(tmp_path, capsys, policy):
+    certdata = helpers.TESTDATA_DIR / "certdata-certumec384.txt"
+    bundle = tmp_path / "standard.crt"
+    assert (
+        helpers.run_main(certdata_input=certdata, ca_standard_bundle_output=bundle) == 0
+    )
+    bundle_key = "cn=Certum_EC-384_CA:6b328085:788f275c81125220a504d02dddba73f4"
+    fingerprint = "6b328085625318aa50d173c98d8bda09d57e27413d114cf787a0f5d06c030cf6"
+
+    # Blocking either copy, by key or by fingerprint, never leaves a trusted
+    # copy behind; blocking the copy that's merged away is an error.
+    for entry, want_status in [
+        (bundle_key, 0 if policy == "off" else 3),
+        (f"sha256:{fingerprint}", 0),
+    ]:
+        blocklist = tmp_path / "blocklist.txt"
+        blocklist.write_text(f"{entry}\n")
+        output = tmp_path / "out.p11"
+        output.unlink(missing_ok=True)
+        capsys.readouterr()
+        status = helpers.run_main(
+            certdata_input=certdata,
+            ca_bundle_input=bundle,
+            blocklist_input=blocklist,
+            p11kit_output=output,
+            dedupe_policy=policy,
+        )
+        assert status == want_status, entry
+        if status == 3:
+            assert bundle_key in capsys.readouterr().err
+            assert not output.exists()
+            continue
+        lines = output.read_text().splitlines()
+        copies = 2 if policy == "off" else 1
+        distrusted = 1 if entry == bundle_key else copies
+        assert lines.count("x-distrusted: true") == distrusted
+        assert lines.count("trusted: true") == copies - distrusted
+
+
+def test_render_shares_output_classes():
+    db = types.CertDB()
+    with open(helpers.TESTDATA_DIR / "certdata-certumec384.txt", "rb") as f:
+        db.add_nss_objs(nss_parser.Parser().parse_lines(f))
+    key = "Certum_EC-384_CA:788f275c81125220a504d02dddba73f4"
+    db.add_records([db.trustmap[key].as_distrusted()])
+
+    rendered = cli.render(
+        db,
+        [
+            p11kit_output.P11KitOutput,
+            certstore_output.OpenSSLCertStoreOutput,
+        ],
+    )
+    assert list(rendered) == [
+        p11kit_output.P11KitOutput,
+        certstore_output.OpenSSLCertStoreOutput,
+    ]
+    for output_cls, by_key in rendered.items():
+        buf = io.StringIO()
+        output_cls(buf).output(db.certmap[key], db.trustmap[key])
+        assert by_key == {key: buf.getvalue()}
+
+
+def test_jobs_outputs_match_serial(tmp_path, monkeypatch):
+    # Render even this tiny store in shards.
+    monkeypatch.setattr(cli, "MIN_KEYS_PER_RENDER_SHARD", 1)
+    certdata = helpers.TESTDATA_DIR / "certdata-certumec384.txt"
+    bundle = tmp_path / "bundle.crt"
+    assert (
+        helpers.run_main(certdata_input=certdata, ca_standard_bundle_output=bundle) == 0
+    )
+
+    trees = []
+    for jobs in (1, 3):
+        out = tmp_path / f"jobs{jobs}"
+        (out / "unpacked").mkdir(parents=True)
+        (out / "hashed").mkdir()
+        assert (
+            helpers.run_main(
+                certdata_input=certdata,
+                ca_bundle_input=bundle,
+                p11kit_output=out / "trust.p11",
+                ca_bundle_output=out / "bundle.crt",
+                ca_standard_bundle_output=out / "standard.crt",
+                ca_unpacked_output=out / "unpacked",
+                ca_hashed_unpacked_output=out / "hashed",
+                jobs=jobs,
+            )
+            == 0
+        )
+        trees.append(
+            {
+                str(path.relative_to(out)): os.readlink(path)
+                if path.is_symlink()
+                else path.read_bytes()
+                for path in sorted(out.rglob("*"))
+                if not path.is_dir()
+            }
+        )
+    assert trees[0] == trees[1]
+    assert "hashed/9482e63a.1" in trees[0]
+
+
+def test_incremental_output(tmp_path):
+    certdata = helpers.TESTDATA_DIR / "certdata-certumec384.txt"
+    out = tmp_path / "hashed"
+    out.mkdir()
+    bundle = tmp_path / "bundle.crt"
+    args = [
+        f"--certdata_input={certdata}",
+        f"--ca_hashed_unpacked_output={out}",
+        f"--ca_bundle_output={bundle}",
+        "--incremental_output",
+    ]
+    assert cli.cli_main(args) == 0
+    crt = out / "Certum_EC-384_CA:788f275c81125220a504d02dddba73f4.crt"
+    link = out / "9482e63a.0"
+    assert os.readlink(link) == crt.name
+    expected = crt.read_text()
+    link_mtime = link.lstat().st_mtime_ns
+
+    # Unchanged outputs are left alone.
+    os.utime(crt, ns=(1, 1))
+    os.utime(bundle, ns=(1, 1))
+    assert cli.cli_main(args) == 0
+    assert crt.stat().st_mtime_ns == 1
+    assert bundle.stat().st_mtime_ns == 1
+    assert link.lstat().st_mtime_ns == link_mtime
+
+    # Changed files are replaced, and broken links and stale entries that we
+    # wrote are fixed up; anything else is kept, even if it looks like ours.
+    crt.write_text(expected.replace("\n", "\r\n"))
+    crt_inode = crt.stat().st_ino
+    manifest = out / cli.HASHED_MANIFEST_FILENAME
+    with manifest.open("a") as f:
+        f.write("Stale.crt\n")
+    (out / "Stale.crt").write_text("stale")
+    (out / "Gone.crt").write_text("not ours")
+    os.symlink("Gone.crt", out / "9482e63a.1")
+    link.unlink()
+    os.symlink("Gone.crt", link)
+    assert cli.cli_main(args) == 0
+    assert crt.read_text() == expected
+    assert crt.stat().st_ino != crt_inode
+    assert os.readlink(link) == crt.name
+    assert sorted(p.name for p in out.iterdir()) == sorted(
+        [crt.name, link.name, manifest.name, "Gone.crt", "9482e63a.1"]
+    )
+    assert manifest.read_text() == f"{link.name}\n{crt.name}\n"
+
+
+def test_default_output_entries(tmp_path):
+    certdata = helpers.TESTDATA_DIR / "certdata-certumec384.txt"
+    crt = "Certum_EC-384_CA:788f275c81125220a504d02dddba73f4.crt"
+    outputs = {
+        "ca_unpacked_output": [crt],
+        "ca_hashed_unpacked_output": ["9482e63a.0", crt],
+    }
+    for name in outputs:
+        (tmp_path / name).mkdir()
+    assert (
+        helpers.run_main(
+            certdata_input=certdata,
+            **{name: tmp_path / name for name in outputs},
+        )
+        == 0
+    )
+    # Without --incremental_output, the directories hold the outputs alone.
+    for name, want in outputs.items():
+        assert sorted(p.name for p in (tmp_path / name).iterdir()) == want
+
+
+def test_bundle_written_atomically(tmp_path, monkeypatch):
+    certdata = helpers.TESTDATA_DIR / "certdata-certumec384.txt"
+    bundle = tmp_path / "bundle.crt"
+    bundle.write_text("old")
+    bundle.chmod(0o600)
+    link = tmp_path / "link.crt"
+    link.symlink_to(bundle.name)
+    old_inode = bundle.stat().st_ino
+    assert helpers.run_main(certdata_input=certdata, ca_bundle_output=link) == 0
+    # The file behind the link is replaced rather than rewritten in place,
+    # and keeps its mode.
+    assert link.is_symlink()
+    assert bundle.stat().st_ino != old_inode
+    assert bundle.stat().st_mode & 0o777 == 0o600
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["bundle.crt", "link.crt"]
+    contents = bundle.read_text()
+    assert contents != "old"
+
+    def fail_replace(*args, **kwargs):
+        raise OSError("disk on fire")
+
+    monkeypatch.setattr(cli.os, "replace", fail_replace)
+    with pytest.raises(OSError):
+        helpers.run_main(certdata_input=certdata, p11kit_output=bundle)
+    assert bundle.read_text() == contents
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["bundle.crt", "link.crt"]
+
+
+def test_unpacked_dir_written_in_place(tmp_path, monkeypatch):
+    certdata = helpers.TESTDATA_DIR / "certdata-certumec384.txt"
+    real = tmp_path / "real"
+    real.mkdir()
+    real.chmod(0o750)
+    (real / "unrelated.pem").write_text("not ours")
+    out = tmp_path / "hashed"
+    out.symlink_to(real.name)
+    crt = "Certum_EC-384_CA:788f275c81125220a504d02dddba73f4.crt"
+    args = [
+        f"--certdata_input={certdata}",
+        f"--ca_bundle_output={out / 'ca-bundle.crt'}",
+        f"--ca_hashed_unpacked_output={out}",
+        "--jobs=2",
+    ]
+
+    # Rebuilding over a populated directory (here, through a symlink) leaves
+    # everything else in it alone, including the other outputs written there.
+    for _ in range(2):
+        assert cli.cli_main(args) == 0
+        assert sorted(p.name for p in out.iterdir()) == [
+            "9482e63a.0",
+            crt,
+            "ca-bundle.crt",
+            "unrelated.pem",
+        ]
+    assert out.is_symlink()
+    assert real.stat().st_mode & 0o777 == 0o750
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["hashed", "real"]
+
+    def fail(*args):
+        raise OSError("disk on fire")
+
+    monkeypatch.setattr(cli, "_reconcile_symlink", fail)
+    (real / "9482e63a.0").unlink()
+    with pytest.raises(OSError):
+        cli.cli_main(args)
+    assert (out / crt).is_file()
+    assert (out / "unrelated.pem").read_text() == "not ours"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["hashed", "real"]
+
+
+@pytest.mark.parametrize("shard_by,shard", [("sha256", "6b"), ("subject_hash", "94")])
+def test_unpacked_shard_by(tmp_path, shard_by, shard):
+    certdata = helpers.TESTDATA_DIR / "certdata-certumec384.txt"
+    flat = tmp_path / "flat"
+    flat.mkdir()
+    assert helpers.run_main(certdata_input=certdata, ca_unpacked_output=flat) == 0
+
+    out = tmp_path / "sharded"
+    out.mkdir()
+    filename = "Certum_EC-384_CA:788f275c81125220a504d02dddba73f4.crt"
+    args = [
+        f"--certdata_input={certdata}",
+        f"--ca_unpacked_output={out}",
+        f"--ca_unpacked_shard_by={shard_by}",
+    ]
+    for extra, manifest in [
+        ([], []),
+        (["--incremental_output"], [cli.UNPACKED_MANIFEST_FILENAME]),
+    ]:
+        assert cli.cli_main(args + extra) == 0
+        assert sorted(str(p.relative_to(out)) for p in out.rglob("*")) == [
+            *manifest,
+            shard,
+            f"{shard}/{filename}",
+            "index.txt",
+        ]
+        assert (out / shard / filename).read_text() == (flat / filename).read_text()
+        assert (out / "index.txt").read_text() == (
+            f"{filename[:-4]}\t{shard}/{filename}\n"
+        )
+
+    # Going back to a flat layout cleans up the shards we wrote, and nothing
+    # else that looks like one.
+    (out / "ff").mkdir()
+    (out / "ff" / filename).write_text("not ours")
+    assert cli.cli_main(args[:2] + ["--incremental_output"]) == 0
+    assert sorted(str(p.relative_to(out)) for p in out.rglob("*")) == [
+        cli.UNPACKED_MANIFEST_FILENAME,
+        filename,
+        "ff",
+        f"ff/{filename}",
+    ]
+
+
+def test_unpacked_shard_by_needs_unpacked_output(tmp_path, capsys):
+    certdata = helpers.TESTDATA_DIR / "certdata-certumec384.txt"
+    with pytest.raises(SystemExit):
+        cli.cli_main(
+            [
+                f"--certdata_input={certdata}",
+                f"--ca_hashed_unpacked_output={tmp_path}",
+                "--ca_unpacked_shard_by=sha256",
+            ]
+        )
+    assert "--ca_unpacked_shard_by requires --ca_unpacked_output" in (
+        capsys.readouterr().err
+    )
+    assert list(tmp_path.iterdir()) == []
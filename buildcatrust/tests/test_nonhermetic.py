@@ -64,3 +64,11 @@ def test_nss_certdata_parse(nss_certdata_path, tmp_path):
         )
         > 20
     )
+
+
+def test_nss_certdata_multiline_octal(nss_certdata_path):
+    with open(nss_certdata_path, "rb") as f:
+        hashes = helpers.certificate_hashes(f)
+    assert len(hashes) > 100
+    for got, want in hashes:
+        assert got == want
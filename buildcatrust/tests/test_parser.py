@@ -3,12 +3,15 @@
 # SPDX-License-Identifier: MIT
 
 import os
+import pickle
 
 import pytest
 
 from buildcatrust import enums
 from buildcatrust import nss_parser
 
+from . import helpers
+
 
 def _parse(s: str):
     return list(nss_parser.Parser().parse_lines(s.encode("utf-8").split(b"\n")))
@@ -164,6 +167,117 @@ CKA_TRUST_STEP_UP_APPROVED CK_BBOOL CK_FALSE
     ]
 
 
+@pytest.mark.parametrize(
+    "ln",
+    [
+        b"",
+        b"BEGINDATA",
+        b"END",
+        b"CKA_CLASS CK_OBJECT_CLASS CKO_CERTIFICATE",
+        b"CKA_VALUE MULTILINE_OCTAL",
+        rb"\060\202\002\145\060\202\001\353\240\003\002\001\002\002\020\170",
+        b'CKA_LABEL UTF8 "Certum EC-384 CA"',
+        b'CKA_ID UTF8 "0"',
+        b'CKA_LABEL UTF8 ""',
+        b'CKA_LABEL UTF8 "with \\"escaped\\" quotes"',
+        b'CKA_LABEL UTF8 "trailing backslash\\"',
+        b'CKA_LABEL "UTF8" "x"',
+        b'"leading" quote',
+        b'CKA_LABEL UTF8 "unterminated',
+        b'CKA_LABEL UTF8 "two" "strings"',
+        b'CKA_LABEL UTF8 ab"cd',
+        b"CKA_X Y 0",
+        b"a b c",
+        b"CKA_X\tCK_BBOOL  CK_TRUE",
+    ],
+)
+def test_split_line_matches_regex(ln):
+    assert nss_parser.Parser._split_line(ln) == list(
+        nss_parser.Parser._split_line_regex(ln)
+    )
+
+
+def test_split_line_matches_regex_certdata():
+    with open(
+        os.path.join(os.path.dirname(__file__), "testdata", "certdata-certumec384.txt"),
+        "rb",
+    ) as f:
+        for ln in f:
+            ln = ln.strip()
+            assert nss_parser.Parser._split_line(ln) == list(
+                nss_parser.Parser._split_line_regex(ln)
+            )
+
+
+def test_decode_multiline_octal_certificate_hashes():
+    with open(helpers.TESTDATA_DIR / "certdata-certumec384.txt", "rb") as f:
+        hashes = helpers.certificate_hashes(f)
+    assert len(hashes) == 1
+    for got, want in hashes:
+        assert got == want
+
+
+@pytest.mark.parametrize(
+    "value,want",
+    [
+        (b"", b""),
+        (rb"\000\377\101", b"\x00\xffA"),
+        (rb"\101\102", b"AB"),
+    ],
+)
+def test_decode_multiline_octal(value, want):
+    assert nss_parser._decode_multiline_octal(value) == want
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        rb"A\102",
+        rb"\101\\",
+        rb"\x41",
+        rb"\7",
+        rb"\400",
+        rb"\1012",
+        rb"\08",
+        # Escapes that don't line up with the groups of four.
+        rb"\0\7\000",
+        rb"\00\\101",
+        rb"\0\x\101",
+    ],
+)
+def test_decode_multiline_octal_malformed(value):
+    with pytest.raises(nss_parser.ParseError):
+        nss_parser._decode_multiline_octal(value)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+def test_feed(chunk_size):
+    with open(helpers.TESTDATA_DIR / "certdata-certumec384.txt", "rb") as f:
+        data = f.read()
+    want = _parse(data.decode("utf-8"))
+
+    parser = nss_parser.Parser()
+    got = []
+    for n in range(0, len(data), chunk_size):
+        got.extend(parser.feed(data[n : n + chunk_size]))
+    # The last object can't be known to be complete until the input ends.
+    assert got == want[:-1]
+    got.extend(parser.close())
+    assert got == want
+
+
+def test_feed_without_trailing_newline():
+    parser = nss_parser.Parser()
+    assert (
+        parser.feed(b"BEGINDATA\nCKA_CLASS CK_OBJECT_CLASS CKO_NSS_TRUST\nCKA_") == []
+    )
+    assert parser.feed(b"TOKEN CK_BBOOL CK_") == []
+    assert parser.feed(b"TRUE") == []
+    assert parser.close() == [
+        {b"CKA_CLASS": enums.ObjectType.NSS_TRUST, b"CKA_TOKEN": True}
+    ]
+
+
 def test_fails_invalid_bool():
     with pytest.raises(nss_parser.ParseError):
         _parse(
@@ -226,3 +340,109 @@ BEGINDATA
 CKA_SOMETHING CK_MY_RANDOM_UNKNOWN CK_OOPS
 """
         )
+
+
+def test_object_offsets():
+    with open(helpers.TESTDATA_DIR / "certdata-certumec384.txt", "rb") as f:
+        data = f.read()
+    offsets = nss_parser.object_offsets(data)
+    assert len(offsets) == 3
+    assert all(data[offset:].startswith(b"CKA_CLASS ") for offset in offsets)
+
+    parser = nss_parser.Parser()
+    want = parser.feed(data) + parser.close()
+    got = []
+    cuts = [0, *offsets, len(data)]
+    for n, (start, end) in enumerate(zip(cuts, cuts[1:])):
+        parser = nss_parser.Parser(in_data=n > 0)
+        got.extend(parser.feed(data[start:end]) + parser.close())
+    assert got == want
+
+
+def test_object_offsets_without_begindata():
+    data = b"CKA_CLASS CK_OBJECT_CLASS CKO_CERTIFICATE\n"
+    assert nss_parser.object_offsets(data) == []
+
+
+@pytest.mark.parametrize(
+    "classes,attributes",
+    [
+        ({enums.ObjectType.NSS_TRUST}, None),
+        (None, {b"CKA_LABEL", b"CKA_SERIAL_NUMBER"}),
+        (
+            {enums.ObjectType.CERTIFICATE, enums.ObjectType.NSS_TRUST},
+            {b"CKA_LABEL", b"CKA_VALUE", b"CKA_TRUST_SERVER_AUTH"},
+        ),
+        (set(), None),
+    ],
+)
+def test_projection(classes, attributes):
+    with open(helpers.TESTDATA_DIR / "certdata-certumec384.txt", "rb") as f:
+        data = f.read()
+    parser = nss_parser.Parser()
+    want = []
+    for obj in parser.feed(data) + parser.close():
+        if classes is not None and obj[b"CKA_CLASS"] not in classes:
+            continue
+        if attributes is not None:
+            obj = {k: v for k, v in obj.items() if k in attributes or k == b"CKA_CLASS"}
+        want.append(obj)
+
+    parser = nss_parser.Parser(classes=classes, attributes=attributes)
+    assert parser.feed(data) + parser.close() == want
+
+
+def test_projection_skips_decoding(monkeypatch):
+    decoded = []
+    real_value_to_python = nss_parser._value_to_python
+
+    def value_to_python(ck_type, ck_value):
+        decoded.append(ck_type)
+        return real_value_to_python(ck_type, ck_value)
+
+    monkeypatch.setattr(nss_parser, "_value_to_python", value_to_python)
+    with open(helpers.TESTDATA_DIR / "certdata-certumec384.txt", "rb") as f:
+        parser = nss_parser.Parser(
+            classes={enums.ObjectType.NSS_TRUST}, attributes={b"CKA_LABEL"}
+        )
+        objs = list(parser.parse_lines(f))
+    assert [obj[b"CKA_LABEL"] for obj in objs] == ["Certum EC-384 CA"]
+    assert b"MULTILINE_OCTAL" not in decoded
+    assert decoded.count(b"CK_OBJECT_CLASS") == 3
+
+
+def test_parsed_object():
+    obj = nss_parser.ParsedObject(
+        {
+            b"CKA_CLASS": enums.ObjectType.CERTIFICATE,
+            b"CKA_LABEL": "label",
+            b"CKA_X_TEST_ONLY_ATTRIBUTE": b"value",
+        }
+    )
+    assert obj[b"CKA_LABEL"] == "label"
+    assert obj[b"CKA_X_TEST_ONLY_ATTRIBUTE"] == b"value"
+    assert obj.get(b"CKA_VALUE") is None
+    assert obj.get(b"CKA_X_NEVER_SEEN", 1) == 1
+    with pytest.raises(KeyError):
+        obj[b"CKA_VALUE"]
+    assert b"CKA_LABEL" in obj
+    assert b"CKA_VALUE" not in obj
+    assert len(obj) == 3
+    assert obj == {
+        b"CKA_CLASS": enums.ObjectType.CERTIFICATE,
+        b"CKA_LABEL": "label",
+        b"CKA_X_TEST_ONLY_ATTRIBUTE": b"value",
+    }
+    assert obj != {b"CKA_LABEL": "label"}
+    assert pickle.loads(pickle.dumps(obj)) == obj
+
+    with open(helpers.TESTDATA_DIR / "certdata-certumec384.txt", "rb") as f:
+        objs = list(nss_parser.Parser().parse_lines(f))
+    assert all(isinstance(obj, nss_parser.ParsedObject) for obj in objs)
+    assert list(objs[0]) == [
+        b"CKA_CLASS",
+        b"CKA_TOKEN",
+        b"CKA_PRIVATE",
+        b"CKA_MODIFIABLE",
+        b"CKA_LABEL",
+    ]
@@ -2,7 +2,11 @@
 #
 # SPDX-License-Identifier: MIT
 
+import dataclasses
 import os
+import pickle
+
+import pytest
 
 from buildcatrust import enums
 from buildcatrust import nss_parser
@@ -18,6 +22,10 @@ def test_certificate():
         objs = list(nss_parser.Parser().parse_lines(f))
 
     cert = types.Certificate.from_parser_object(objs[1])
+    # Nothing is hashed until it's asked for.
+    assert cert._sha1_fingerprint is None
+    assert cert._sha256_fingerprint is None
+    assert cert._openssl_subject_hash is None
     assert cert.label == "Certum EC-384 CA"
     assert cert.id == "0"
     assert cert.mozilla_ca_policy
@@ -29,9 +37,18 @@ def test_certificate():
         == "6b328085625318aa50d173c98d8bda09d57e27413d114cf787a0f5d06c030cf6"
     )
     assert cert.openssl_subject_hash == "9482e63a"
+    assert cert.openssl_subject_hash is cert.openssl_subject_hash
+    assert (
+        cert.spki_sha256_fingerprint
+        == "de7b6932e9c44582ce0de07abdab7eea90c75d6d2a07331df57bd5cb88553d13"
+    )
 
     assert cert.clean_filename == "Certum_EC-384_CA:788f275c81125220a504d02dddba73f4"
 
+    assert cert.public_key_pem_text() == cert.public_key_pem().encode()
+    assert cert.public_key_pem_text() is cert.public_key_pem_text()
+    assert cert.as_pem_text() == cert.as_pem().encode()
+    assert cert.as_pem_text() is cert.as_pem_text()
     assert (
         cert.public_key_pem().encode()
         == """\
@@ -106,6 +123,60 @@ def test_trust_as_distrusted():
     )
 
 
+def test_trust_packed_state():
+    with open(
+        os.path.join(os.path.dirname(__file__), "testdata", "certdata-certumec384.txt"),
+        "rb",
+    ) as f:
+        objs = list(nss_parser.Parser().parse_lines(f))
+    trust = types.Trust.from_parser_object(objs[2])
+
+    changed = dataclasses.replace(trust, trust_client_auth=enums.TrustType.NOT_TRUSTED)
+    assert changed.trust_client_auth == enums.TrustType.NOT_TRUSTED
+    for attr in types.Trust.TRUST_ATTRS:
+        if attr != "trust_client_auth":
+            assert getattr(changed, attr) == getattr(trust, attr)
+    assert changed != trust
+    assert changed.distrusted
+    assert [str(oid) for oid in changed.untrusted_key_usages] == ["1.3.6.1.5.5.7.3.2"]
+    assert pickle.loads(pickle.dumps(changed)) == changed
+
+    # Callers get their own copy of the usage lists.
+    trust.trusted_key_usages.clear()
+    assert trust.trusted_key_usages
+
+    bare = types.Trust(
+        label="x",
+        issuer=trust.issuer,
+        serial_number=trust.serial_number,
+        trust_step_up_approved=False,
+    )
+    for attr in types.Trust.TRUST_ATTRS:
+        assert getattr(bare, attr) == enums.TrustType.UNKNOWN
+
+
+def test_trust_repr():
+    with open(
+        os.path.join(os.path.dirname(__file__), "testdata", "certdata-certumec384.txt"),
+        "rb",
+    ) as f:
+        objs = list(nss_parser.Parser().parse_lines(f))
+    trust = types.Trust.from_parser_object(objs[2])
+
+    text = repr(trust)
+    assert text.startswith("Trust(label='Certum EC-384 CA', issuer=")
+    assert "trust_state" not in text
+    assert text.endswith(
+        "trust_step_up_approved=False, "
+        "trust_server_auth=TrustType.TRUSTED_DELEGATOR, "
+        "trust_code_signing=TrustType.MUST_VERIFY_TRUST, "
+        "trust_email_protection=TrustType.TRUSTED_DELEGATOR)"
+    )
+    assert repr(trust.as_distrusted()).count("=TrustType.NOT_TRUSTED") == len(
+        types.Trust.TRUST_ATTRS
+    )
+
+
 def test_certdb():
     certdb = types.CertDB()
     with open(
@@ -116,3 +187,103 @@ def test_certdb():
 
     assert "Certum_EC-384_CA:788f275c81125220a504d02dddba73f4" in certdb.certmap
     assert "Certum_EC-384_CA:788f275c81125220a504d02dddba73f4" in certdb.trustmap
+
+
+def test_records_share_names():
+    certdb = types.CertDB()
+    with open(
+        os.path.join(os.path.dirname(__file__), "testdata", "certdata-certumec384.txt"),
+        "rb",
+    ) as f:
+        certdb.add_nss_objs(nss_parser.Parser().parse_lines(f))
+
+    (cert,) = certdb.certmap.values()
+    (trust,) = certdb.trustmap.values()
+    assert cert.issuer is trust.issuer
+    assert cert.label is trust.label
+    assert not hasattr(cert, "__dict__")
+    assert not hasattr(trust, "__dict__")
+
+
+def test_certdb_indexes():
+    certdb = types.CertDB()
+    with open(
+        os.path.join(os.path.dirname(__file__), "testdata", "certdata-certumec384.txt"),
+        "rb",
+    ) as f:
+        certdb.add_nss_objs(nss_parser.Parser().parse_lines(f))
+    key = "Certum_EC-384_CA:788f275c81125220a504d02dddba73f4"
+    cert = certdb.certmap[key]
+    trust = certdb.trustmap[key]
+
+    assert certdb.lookup("sha256", cert.sha256_fingerprint) == {key}
+    assert certdb.lookup("sha1", cert.sha1_fingerprint) == {key}
+    assert certdb.lookup("spki_sha256", cert.spki_sha256_fingerprint) == {key}
+    assert certdb.lookup("subject_hash", "9482e63a") == {key}
+    assert certdb.lookup("label", "Certum EC-384 CA") == {key}
+    assert certdb.lookup("issuer_serial", (cert.issuer.der, cert.serial_number)) == {
+        key
+    }
+    assert certdb.lookup("sha256", "nope") == set()
+
+    # Indexes that have already been built are kept up to date.
+    other = dataclasses.replace(cert, label="Other")
+    certdb.add_records([other])
+    assert certdb.lookup("sha256", cert.sha256_fingerprint) == {
+        key,
+        other.clean_filename,
+    }
+    assert certdb.lookup("label", "Other") == {other.clean_filename}
+    assert certdb.index("subject_hash") == {"9482e63a": {key, other.clean_filename}}
+
+    renamed = dataclasses.replace(trust, label="Renamed")
+    certdb.add_records([renamed])
+    assert certdb.lookup("label", "Renamed") == {renamed.clean_filename}
+
+    certdb.remove(key)
+    assert key not in certdb.certmap and key not in certdb.trustmap
+    assert certdb.lookup("sha256", cert.sha256_fingerprint) == {other.clean_filename}
+    assert certdb.lookup("label", "Certum EC-384 CA") == set()
+
+
+@pytest.mark.parametrize("policy", types.DEDUPE_POLICIES)
+def test_certdb_dedupe(policy):
+    certdb = types.CertDB()
+    with open(
+        os.path.join(os.path.dirname(__file__), "testdata", "certdata-certumec384.txt"),
+        "rb",
+    ) as f:
+        certdb.add_nss_objs(nss_parser.Parser().parse_lines(f))
+    key = "Certum_EC-384_CA:788f275c81125220a504d02dddba73f4"
+    cert = certdb.certmap[key]
+    trust = certdb.trustmap[key]
+    other = dataclasses.replace(cert, label="Other")
+    certdb.add_records(
+        [
+            other,
+            dataclasses.replace(
+                trust,
+                label="Other",
+                trust_email_protection=enums.TrustType.NOT_TRUSTED,
+                trust_code_signing=enums.TrustType.TRUSTED,
+            ),
+        ]
+    )
+
+    assert certdb.dedupe(policy) == {key: [other.clean_filename]}
+    assert list(certdb.certmap) == [key]
+    assert list(certdb.trustmap) == [key]
+    assert certdb.lookup("sha256", cert.sha256_fingerprint) == {key}
+    merged = certdb.trustmap[key]
+    assert merged.label == trust.label
+    assert merged.trust_server_auth == enums.TrustType.TRUSTED_DELEGATOR
+    assert merged.trust_code_signing == enums.TrustType.MUST_VERIFY_TRUST
+    if policy == "first_wins":
+        assert merged == trust
+    else:
+        assert merged.trust_email_protection == enums.TrustType.NOT_TRUSTED
+        assert merged.distrusted
+
+    assert certdb.dedupe(policy) == {}
+    with pytest.raises(ValueError):
+        certdb.dedupe("last_wins")
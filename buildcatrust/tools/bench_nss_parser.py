@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+# SPDX-FileCopyrightText: 2021 the buildcatrust authors
+#
+# SPDX-License-Identifier: MIT
+
+"""Compares the regex and fast-path tokenizers on one or more certdata.txt files."""
+
+import sys
+import time
+from typing import Callable
+
+from buildcatrust import nss_parser
+
+
+def regex_parse(lines: list[bytes]) -> list[nss_parser.ParsedObject]:
+    # The old way: every line through the regex, every token through its own
+    # generator.
+    parser = nss_parser.Parser()
+    objs = []
+    for ln in lines:
+        ln = ln.strip()
+        if ln.startswith(b"#"):
+            continue
+        for token in parser._split_line_regex(ln):
+            objs.extend(parser.parse_token(token))
+    objs.extend(parser.parse_lines([]))
+    return objs
+
+
+def fast_parse(lines: list[bytes]) -> list[nss_parser.ParsedObject]:
+    return list(nss_parser.Parser().parse_lines(lines))
+
+
+def best_time(
+    fn: Callable[[list[bytes]], list[nss_parser.ParsedObject]],
+    lines: list[bytes],
+    rounds: int,
+) -> tuple[float, list[nss_parser.ParsedObject]]:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        objs = fn(lines)
+        best = min(best, time.perf_counter() - start)
+    return best, objs
+
+
+def process_path(path: str, rounds: int) -> None:
+    with open(path, "rb") as f:
+        lines = f.readlines()
+    regex_time, regex_objs = best_time(regex_parse, lines, rounds)
+    fast_time, fast_objs = best_time(fast_parse, lines, rounds)
+    if regex_objs != fast_objs:
+        raise AssertionError(f"{path}: tokenizers disagree")
+    print(
+        f"{path}: {len(lines)} lines, {len(fast_objs)} objects; "
+        f"regex {regex_time * 1000:.1f}ms, fast path {fast_time * 1000:.1f}ms "
+        f"({regex_time / fast_time:.2f}x)"
+    )
+
+
+def main(argv: list[str]) -> int:
+    for path in argv:
+        process_path(path, rounds=5)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -2,9 +2,12 @@
 #
 # SPDX-License-Identifier: MIT
 
+from collections.abc import Callable
+from collections.abc import Hashable
 from collections.abc import Iterable
 import dataclasses
 import hashlib
+import sys
 from typing import Protocol
 
 from . import der_x509
@@ -19,7 +22,7 @@ def _dn_from_der(b: bytes) -> der_x509.DistinguishedName:
     return dn
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, slots=True)
 class Certificate:
     label: str
     subject: der_x509.DistinguishedName
@@ -31,13 +34,38 @@ class Certificate:
     server_distrust_after: bytes | None
     email_distrust_after: bytes | None
 
-    sha1_fingerprint: str
-    sha256_fingerprint: str
+    # The decoded certificate, filled in on first use so that each certificate
+    # is only ever decoded once.
+    _x509: der_x509.Certificate | None = dataclasses.field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    # Hashes, which are likewise only computed if something asks for them.
+    _sha1_fingerprint: str | None = dataclasses.field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _sha256_fingerprint: str | None = dataclasses.field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _spki_sha256_fingerprint: str | None = dataclasses.field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _openssl_subject_hash: str | None = dataclasses.field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    # Encoded PEM text, shared by every output that writes this certificate.
+    _pem_text: str | None = dataclasses.field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _public_key_pem_text: str | None = dataclasses.field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     @classmethod
     def from_parser_object(cls, obj: nss_parser.ParsedObject) -> "Certificate":
         return cls(
-            label=obj[b"CKA_LABEL"],
+            label=sys.intern(obj[b"CKA_LABEL"]),
             subject=_dn_from_der(obj[b"CKA_SUBJECT"]),
             id=obj[b"CKA_ID"],
             issuer=_dn_from_der(obj[b"CKA_ISSUER"]),
@@ -47,8 +75,6 @@ class Certificate:
             server_distrust_after=obj.get(b"CKA_NSS_SERVER_DISTRUST_AFTER", None)
             or None,
             email_distrust_after=obj.get(b"CKA_NSS_EMAIL_DISTRUST_AFTER", None) or None,
-            sha1_fingerprint=hashlib.sha1(obj[b"CKA_VALUE"]).hexdigest(),
-            sha256_fingerprint=hashlib.sha256(obj[b"CKA_VALUE"]).hexdigest(),
         )
 
     @classmethod
@@ -60,8 +86,8 @@ class Certificate:
             label = f"{subject.last_part()}:{sha256_fingerprint[:8]}"
         else:
             label = sha256_fingerprint
-        return cls(
-            label=label,
+        cert = cls(
+            label=sys.intern(label),
             subject=subject,
             id=b"0",
             issuer=_dn_from_der(tbs.issuer),
@@ -70,26 +96,64 @@ class Certificate:
             mozilla_ca_policy=False,
             server_distrust_after=None,
             email_distrust_after=None,
-            sha1_fingerprint=hashlib.sha1(b).hexdigest(),
-            sha256_fingerprint=sha256_fingerprint,
         )
+        object.__setattr__(cert, "_x509", obj)
+        object.__setattr__(cert, "_sha256_fingerprint", sha256_fingerprint)
+        return cert
 
     @property
     def clean_filename(self) -> str:
         return _to_filename(self)
 
+    @property
+    def sha1_fingerprint(self) -> str:
+        if self._sha1_fingerprint is None:
+            fingerprint = hashlib.sha1(self.value).hexdigest()
+            object.__setattr__(self, "_sha1_fingerprint", fingerprint)
+        return self._sha1_fingerprint
+
+    @property
+    def sha256_fingerprint(self) -> str:
+        if self._sha256_fingerprint is None:
+            fingerprint = hashlib.sha256(self.value).hexdigest()
+            object.__setattr__(self, "_sha256_fingerprint", fingerprint)
+        return self._sha256_fingerprint
+
+    @property
+    def spki_sha256_fingerprint(self) -> str:
+        """The SHA-256 of the certificate's SubjectPublicKeyInfo, as used for pinning."""
+        if self._spki_sha256_fingerprint is None:
+            spki = self.as_x509().tbs_certificate.subject_public_key_info
+            fingerprint = hashlib.sha256(spki).hexdigest()
+            object.__setattr__(self, "_spki_sha256_fingerprint", fingerprint)
+        return self._spki_sha256_fingerprint
+
     @property
     def openssl_subject_hash(self) -> str:
-        # Reimplementation of:
-        # https://github.com/openssl/openssl/blob/925118e8c3b1041ce7f9840c2d67e7f878123e6b/crypto/x509/x509_cmp.c#L289
-        h = hashlib.sha1(usedforsecurity=False)
-        h.update(self.subject.as_openssl_canon_der())
-        return h.digest()[::-1].hex()[-8:]
+        if self._openssl_subject_hash is None:
+            # Reimplementation of:
+            # https://github.com/openssl/openssl/blob/925118e8c3b1041ce7f9840c2d67e7f878123e6b/crypto/x509/x509_cmp.c#L289
+            h = hashlib.sha1(usedforsecurity=False)
+            h.update(self.subject.as_openssl_canon_der())
+            subject_hash = h.digest()[::-1].hex()[-8:]
+            object.__setattr__(self, "_openssl_subject_hash", subject_hash)
+        return self._openssl_subject_hash
+
+    def as_x509(self) -> der_x509.Certificate:
+        if self._x509 is None:
+            der_cert, trailing = der_x509.Certificate.from_der(self.value)
+            assert not trailing
+            object.__setattr__(self, "_x509", der_cert)
+        return self._x509
 
     def public_key_pem(self) -> der_x509.PEMBlock:
-        der_cert, trailing = der_x509.Certificate.from_der(self.value)
-        assert not trailing
-        return der_cert.public_key_pem()
+        return self.as_x509().public_key_pem()
+
+    def public_key_pem_text(self) -> str:
+        if self._public_key_pem_text is None:
+            text = self.public_key_pem().encode()
+            object.__setattr__(self, "_public_key_pem_text", text)
+        return self._public_key_pem_text
 
     def as_pem(self) -> der_x509.PEMBlock:
         return der_x509.PEMBlock(
@@ -97,8 +161,94 @@ class Certificate:
             content=self.value,
         )
 
-
-@dataclasses.dataclass(frozen=True)
+    def as_pem_text(self) -> str:
+        if self._pem_text is None:
+            object.__setattr__(self, "_pem_text", self.as_pem().encode())
+        return self._pem_text
+
+
+_CORE_TRUST_ATTRS = [
+    "trust_server_auth",
+    "trust_client_auth",
+    "trust_code_signing",
+]
+
+_TRUST_ATTRS = _CORE_TRUST_ATTRS + [
+    "trust_digital_signature",
+    "trust_non_repudiation",
+    "trust_key_encipherment",
+    "trust_data_encipherment",
+    "trust_key_agreement",
+    "trust_key_cert_sign",
+    "trust_crl_sign",
+    "trust_email_protection",
+    "trust_ipsec_end_system",
+    "trust_ipsec_tunnel",
+    "trust_ipsec_user",
+    "trust_time_stamping",
+]
+
+# Trust.trust_state packs each of the _TRUST_ATTRS into three bits, holding
+# the value of its TrustType.
+_TRUST_STATE_BITS = 3
+_TRUST_STATE_MASK = (1 << _TRUST_STATE_BITS) - 1
+_TRUST_SHIFTS = {attr: n * _TRUST_STATE_BITS for n, attr in enumerate(_TRUST_ATTRS)}
+_TRUST_TYPES_BY_VALUE = {t.value: t for t in enums.TrustType}
+assert max(_TRUST_TYPES_BY_VALUE) <= _TRUST_STATE_MASK
+
+
+def _trust_state_all(trust_type: enums.TrustType) -> int:
+    state = 0
+    for shift in _TRUST_SHIFTS.values():
+        state |= trust_type.value << shift
+    return state
+
+
+_ALL_UNKNOWN = _trust_state_all(enums.TrustType.UNKNOWN)
+
+# How restrictive each TrustType's value is, for Trust.most_restrictive.
+_RESTRICTIVENESS = {
+    t.value: n
+    for n, t in enumerate(
+        [
+            enums.TrustType.TRUSTED_DELEGATOR,
+            enums.TrustType.TRUSTED,
+            enums.TrustType.UNKNOWN,
+            enums.TrustType.MUST_VERIFY_TRUST,
+            enums.TrustType.NOT_TRUSTED,
+        ]
+    )
+}
+_ALL_NOT_TRUSTED = _trust_state_all(enums.TrustType.NOT_TRUSTED)
+
+# Where in the trust state to find the TrustType for each purpose.
+_PURPOSE_SHIFTS = [
+    (purpose.object_id, _TRUST_SHIFTS[f"trust_{purpose.trust_name}"])
+    for purpose in x509_consts.PURPOSES
+]
+
+# Usages don't depend on anything but the trust state, and there are only a
+# handful of distinct states in practice, so work them out once per state.
+_KEY_USAGES: dict[int, tuple[list[der_x509.ObjectID], list[der_x509.ObjectID]]] = {}
+
+
+def _key_usages(
+    state: int,
+) -> tuple[list[der_x509.ObjectID], list[der_x509.ObjectID]]:
+    usages = _KEY_USAGES.get(state)
+    if usages is None:
+        trusted, rejected = [], []
+        for oid, shift in _PURPOSE_SHIFTS:
+            value = (state >> shift) & _TRUST_STATE_MASK
+            if value == enums.TrustType.TRUSTED_DELEGATOR.value:
+                trusted.append(oid)
+            elif value == enums.TrustType.NOT_TRUSTED.value:
+                rejected.append(oid)
+        usages = _KEY_USAGES[state] = (trusted, rejected)
+    return usages
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
 class Trust:
     label: str
     issuer: der_x509.DistinguishedName
@@ -106,54 +256,69 @@ class Trust:
 
     trust_step_up_approved: bool
 
-    trust_server_auth: enums.TrustType
-    trust_client_auth: enums.TrustType
-    trust_code_signing: enums.TrustType
-
-    trust_digital_signature: enums.TrustType
-    trust_non_repudiation: enums.TrustType
-    trust_key_encipherment: enums.TrustType
-    trust_data_encipherment: enums.TrustType
-    trust_key_agreement: enums.TrustType
-    trust_key_cert_sign: enums.TrustType
-    trust_crl_sign: enums.TrustType
-    trust_email_protection: enums.TrustType
-    trust_ipsec_end_system: enums.TrustType
-    trust_ipsec_tunnel: enums.TrustType
-    trust_ipsec_user: enums.TrustType
-    trust_time_stamping: enums.TrustType
-
-    CORE_TRUST_ATTRS = [
-        "trust_server_auth",
-        "trust_client_auth",
-        "trust_code_signing",
-    ]
-
-    TRUST_ATTRS = CORE_TRUST_ATTRS + [
-        "trust_digital_signature",
-        "trust_non_repudiation",
-        "trust_key_encipherment",
-        "trust_data_encipherment",
-        "trust_key_agreement",
-        "trust_key_cert_sign",
-        "trust_crl_sign",
-        "trust_email_protection",
-        "trust_ipsec_end_system",
-        "trust_ipsec_tunnel",
-        "trust_ipsec_user",
-        "trust_time_stamping",
-    ]
+    # The TrustType for each of TRUST_ATTRS, packed into an int. It's built
+    # from the trust_* values passed to the constructor; any that are left
+    # out are UNKNOWN.
+    trust_state: int = dataclasses.field(default=_ALL_UNKNOWN, init=False, repr=False)
+
+    # These must be declared in the same order as TRUST_ATTRS.
+    trust_server_auth: dataclasses.InitVar[enums.TrustType | None] = None
+    trust_client_auth: dataclasses.InitVar[enums.TrustType | None] = None
+    trust_code_signing: dataclasses.InitVar[enums.TrustType | None] = None
+
+    trust_digital_signature: dataclasses.InitVar[enums.TrustType | None] = None
+    trust_non_repudiation: dataclasses.InitVar[enums.TrustType | None] = None
+    trust_key_encipherment: dataclasses.InitVar[enums.TrustType | None] = None
+    trust_data_encipherment: dataclasses.InitVar[enums.TrustType | None] = None
+    trust_key_agreement: dataclasses.InitVar[enums.TrustType | None] = None
+    trust_key_cert_sign: dataclasses.InitVar[enums.TrustType | None] = None
+    trust_crl_sign: dataclasses.InitVar[enums.TrustType | None] = None
+    trust_email_protection: dataclasses.InitVar[enums.TrustType | None] = None
+    trust_ipsec_end_system: dataclasses.InitVar[enums.TrustType | None] = None
+    trust_ipsec_tunnel: dataclasses.InitVar[enums.TrustType | None] = None
+    trust_ipsec_user: dataclasses.InitVar[enums.TrustType | None] = None
+    trust_time_stamping: dataclasses.InitVar[enums.TrustType | None] = None
+
+    CORE_TRUST_ATTRS = _CORE_TRUST_ATTRS
+    TRUST_ATTRS = _TRUST_ATTRS
+
+    def __post_init__(self, *trust_values: enums.TrustType | None) -> None:
+        state = _ALL_UNKNOWN
+        for shift, value in zip(_TRUST_SHIFTS.values(), trust_values):
+            if value is not None:
+                state &= ~(_TRUST_STATE_MASK << shift)
+                state |= value.value << shift
+        object.__setattr__(self, "trust_state", state)
+
+    def __repr__(self) -> str:
+        # Spell out the trust state as the trust_* values it packs, leaving out
+        # the ones that are UNKNOWN.
+        parts = [
+            f"{field.name}={getattr(self, field.name)!r}"
+            for field in dataclasses.fields(self)
+            if field.repr
+        ]
+        for attr in _TRUST_ATTRS:
+            value = getattr(self, attr)
+            if value != enums.TrustType.UNKNOWN:
+                parts.append(f"{attr}={value}")
+        return f"{type(self).__name__}({', '.join(parts)})"
 
     def as_distrusted(self) -> "Trust":
         # Generate a new version of this Trust where we distrust everything.
-        return dataclasses.replace(
-            self, **{k: enums.TrustType.NOT_TRUSTED for k in self.TRUST_ATTRS}
+        trust = Trust(
+            label=self.label,
+            issuer=self.issuer,
+            serial_number=self.serial_number,
+            trust_step_up_approved=self.trust_step_up_approved,
         )
+        object.__setattr__(trust, "trust_state", _ALL_NOT_TRUSTED)
+        return trust
 
     @classmethod
     def from_parser_object(cls, obj: nss_parser.ParsedObject):
         return cls(
-            label=obj[b"CKA_LABEL"],
+            label=sys.intern(obj[b"CKA_LABEL"]),
             issuer=_dn_from_der(obj[b"CKA_ISSUER"]),
             serial_number=obj[b"CKA_SERIAL_NUMBER"],
             trust_step_up_approved=obj[b"CKA_TRUST_STEP_UP_APPROVED"],
@@ -196,31 +361,60 @@ class Trust:
             ),
         )
 
+    def most_restrictive(self, others: Iterable["Trust"]) -> "Trust":
+        """Merges other trust records for the same certificate into this one.
+
+        Each purpose gets the most restrictive value any of them has, from
+        NOT_TRUSTED down to TRUSTED_DELEGATOR. Step-up is only approved if
+        they all approve it.
+        """
+        state = self.trust_state
+        step_up_approved = self.trust_step_up_approved
+        for other in others:
+            step_up_approved = step_up_approved and other.trust_step_up_approved
+            for shift in _TRUST_SHIFTS.values():
+                ours = (state >> shift) & _TRUST_STATE_MASK
+                theirs = (other.trust_state >> shift) & _TRUST_STATE_MASK
+                if _RESTRICTIVENESS[theirs] > _RESTRICTIVENESS[ours]:
+                    state = (state & ~(_TRUST_STATE_MASK << shift)) | (theirs << shift)
+        trust = Trust(
+            label=self.label,
+            issuer=self.issuer,
+            serial_number=self.serial_number,
+            trust_step_up_approved=step_up_approved,
+        )
+        object.__setattr__(trust, "trust_state", state)
+        return trust
+
     @property
     def distrusted(self) -> bool:
         # We distrust the cert if it is untrusted for *anything*.
-        return bool(self.untrusted_key_usages)
-
-    def _key_usages(self, trust_state: enums.TrustType) -> list[der_x509.ObjectID]:
-        oids = []
-        for purpose in x509_consts.PURPOSES:
-            if getattr(self, f"trust_{purpose.trust_name}") == trust_state:
-                oids.append(purpose.object_id)
-        return oids
+        return bool(_key_usages(self.trust_state)[1])
 
     @property
     def trusted_key_usages(self) -> list[der_x509.ObjectID]:
-        return self._key_usages(enums.TrustType.TRUSTED_DELEGATOR)
+        return list(_key_usages(self.trust_state)[0])
 
     @property
     def untrusted_key_usages(self) -> list[der_x509.ObjectID]:
-        return self._key_usages(enums.TrustType.NOT_TRUSTED)
+        return list(_key_usages(self.trust_state)[1])
 
     @property
     def clean_filename(self) -> str:
         return _to_filename(self)
 
 
+def _trust_property(shift: int) -> property:
+    def get(self: Trust) -> enums.TrustType:
+        return _TRUST_TYPES_BY_VALUE[(self.trust_state >> shift) & _TRUST_STATE_MASK]
+
+    return property(get)
+
+
+for _attr, _shift in _TRUST_SHIFTS.items():
+    setattr(Trust, _attr, _trust_property(_shift))
+
+
 def _to_filename(obj: Certificate | Trust) -> str:
     serial, _, serial_rem = der_x509.der_int_to_python(obj.serial_number)
     assert not serial_rem
@@ -240,26 +434,171 @@ def _to_filename(obj: Certificate | Trust) -> str:
     )
 
 
+def _cert_attr(name: str) -> Callable[[Certificate | Trust], Hashable | None]:
+    def get(record: Certificate | Trust) -> Hashable | None:
+        if isinstance(record, Certificate):
+            return getattr(record, name)
+        return None
+
+    return get
+
+
+# The secondary indexes CertDB can look records up by, and how to get each
+# record's value for them. None means the record isn't in that index.
+_INDEXES: dict[str, Callable[[Certificate | Trust], Hashable | None]] = {
+    "sha256": _cert_attr("sha256_fingerprint"),
+    "sha1": _cert_attr("sha1_fingerprint"),
+    "spki_sha256": _cert_attr("spki_sha256_fingerprint"),
+    "subject_hash": _cert_attr("openssl_subject_hash"),
+    "label": lambda record: record.label,
+    "issuer_serial": lambda record: (record.issuer.der, record.serial_number),
+}
+
+_Index = dict[Hashable, set[str]]
+
+DEDUPE_POLICIES = ("first_wins", "most_restrictive")
+
+
 @dataclasses.dataclass(frozen=True)
 class CertDB:
     certmap: dict[str, Certificate] = dataclasses.field(default_factory=dict)
     trustmap: dict[str, Trust] = dataclasses.field(default_factory=dict)
 
+    # Secondary indexes, by (map name, index name). Each is built the first
+    # time it's used, and kept up to date as records are added after that, so
+    # once you've looked anything up, only change the maps through
+    # add_records(), add_certs() and remove().
+    _indexes: dict[tuple[str, str], _Index] = dataclasses.field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+
     def add_nss_objs(self, objs: Iterable[nss_parser.ParsedObject]) -> None:
-        for obj in objs:
-            pobj = _parser_object_to_python(obj)
-            if isinstance(pobj, Certificate):
-                self.certmap[pobj.clean_filename] = pobj
-            elif isinstance(pobj, Trust):
-                self.trustmap[pobj.clean_filename] = pobj
+        self.add_records(from_parser_objects(objs))
+
+    def add_records(self, records: Iterable[Certificate | Trust]) -> None:
+        for record in records:
+            if isinstance(record, Certificate):
+                self._store("certmap", record.clean_filename, record)
+            elif isinstance(record, Trust):
+                self._store("trustmap", record.clean_filename, record)
 
     def add_certs(self, objs: Iterable[tuple[Certificate, Trust]]) -> None:
         for cert, trust in objs:
             assert cert.label == trust.label
             assert cert.issuer == trust.issuer
             assert cert.serial_number == trust.serial_number
-            self.certmap[cert.clean_filename] = cert
-            self.trustmap[trust.clean_filename] = trust
+            self._store("certmap", cert.clean_filename, cert)
+            self._store("trustmap", trust.clean_filename, trust)
+
+    def remove(self, key: str) -> None:
+        """Removes the certificate and trust stored under key, if there are any."""
+        for map_name in ("certmap", "trustmap"):
+            self._store(map_name, key, None)
+
+    def lookup(self, index_name: str, value: Hashable) -> set[str]:
+        """Returns the keys of all records with the given value for an index.
+
+        The indexes are sha256, sha1, spki_sha256 and subject_hash, which
+        only cover certificates, and label and issuer_serial (a tuple of
+        the issuer's DER and the DER serial number), which cover both.
+        """
+        keys = set()
+        for map_name in ("certmap", "trustmap"):
+            keys |= self._index(map_name, index_name).get(value, set())
+        return keys
+
+    def index(self, index_name: str) -> dict[Hashable, set[str]]:
+        """Returns every value in an index, with the keys of its records."""
+        merged = {}
+        for map_name in ("certmap", "trustmap"):
+            for value, keys in self._index(map_name, index_name).items():
+                merged.setdefault(value, set()).update(keys)
+        return merged
+
+    def dedupe(self, policy: str) -> dict[str, list[str]]:
+        """Collapses certificates with the same SHA-256 fingerprint into one.
+
+        The certificate that was added first is kept, under its own key. With
+        the "first_wins" policy its trust is kept as it is; with
+        "most_restrictive" it's merged with the trust of all its duplicates
+        (see Trust.most_restrictive). The duplicates are then removed.
+
+        Returns the keys that were removed, by the key they were merged into.
+        """
+        if policy not in DEDUPE_POLICIES:
+            raise ValueError(f"unknown dedupe policy {policy!r}")
+        positions = {key: n for n, key in enumerate(self.certmap)}
+        merged = {}
+        for keys in self.index("sha256").values():
+            if len(keys) < 2:
+                continue
+            keep, *duplicates = sorted(keys, key=positions.__getitem__)
+            if policy == "most_restrictive" and keep in self.trustmap:
+                self.add_records(
+                    [
+                        self.trustmap[keep].most_restrictive(
+                            self.trustmap[key]
+                            for key in duplicates
+                            if key in self.trustmap
+                        )
+                    ]
+                )
+            for key in duplicates:
+                self.remove(key)
+            merged[keep] = sorted(duplicates)
+        return dict(sorted(merged.items()))
+
+    def _index(self, map_name: str, index_name: str) -> _Index:
+        index = self._indexes.get((map_name, index_name))
+        if index is None:
+            index = {}
+            get_value = _INDEXES[index_name]
+            for key, record in getattr(self, map_name).items():
+                value = get_value(record)
+                if value is not None:
+                    index.setdefault(value, set()).add(key)
+            self._indexes[(map_name, index_name)] = index
+        return index
+
+    def _store(
+        self, map_name: str, key: str, record: Certificate | Trust | None
+    ) -> None:
+        records = getattr(self, map_name)
+        if record is None:
+            old = records.pop(key, None)
+        else:
+            old = records.get(key)
+            records[key] = record
+        for (indexed_map_name, index_name), index in self._indexes.items():
+            if indexed_map_name != map_name:
+                continue
+            get_value = _INDEXES[index_name]
+            if old is not None:
+                value = get_value(old)
+                if value is not None:
+                    keys = index[value]
+                    keys.discard(key)
+                    if not keys:
+                        del index[value]
+            if record is not None:
+                value = get_value(record)
+                if value is not None:
+                    index.setdefault(value, set()).add(key)
+
+
+# The only object classes from_parser_objects() turns into records.
+PARSER_CLASSES = frozenset({enums.ObjectType.CERTIFICATE, enums.ObjectType.NSS_TRUST})
+
+
+def from_parser_objects(
+    objs: Iterable[nss_parser.ParsedObject],
+) -> list[Certificate | Trust]:
+    records = []
+    for obj in objs:
+        pobj = _parser_object_to_python(obj)
+        if pobj is not None:
+            records.append(pobj)
+    return records
 
 
 def _parser_object_to_python(
@@ -96,3 +96,10 @@ ATTRIBUTES = {
         ),
     ]
 }
+
+for _object_id in (
+    *(purpose.object_id for purpose in PURPOSES),
+    EXTENDED_KEY_USAGE_OID,
+    *ATTRIBUTES.values(),
+):
+    der_x509.register_object_id(_object_id)